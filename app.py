@@ -1,23 +1,53 @@
-from flask import Flask, render_template, send_from_directory, request, jsonify
+from flask import Flask, render_template, send_file, request, jsonify, Response, stream_with_context, abort
 import threading
-import schedule
 import time
 import os
+import base64
 import csv
+import gzip
+import hashlib
 import json
 import logging
-from datetime import datetime
-from ytmusicapi import YTMusic
+import random
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 
-# Import our existing classes
-from scraper import Scraper
+# Import our existing classes. The scraper (requests, bs4) and ytmusicapi are
+# imported on first use so that starting a web worker stays cheap.
+import metrics
+from throttle import TokenBucket, CircuitBreaker, is_retryable
+from jobs import JobQueue
 
 app = Flask(__name__)
-scraper = Scraper()
 
-# Background Scheduler Thread
+_scraper = None
+_job_queue = None
+_init_lock = threading.Lock()
+
+def get_scraper():
+    """The process-wide Scraper (config and database), built on first use."""
+    global _scraper
+    with _init_lock:
+        if _scraper is None:
+            from scraper import Scraper
+            _scraper = Scraper()
+        return _scraper
+
+def get_job_queue():
+    """
+    The job queue. Only the worker (worker.py, or `python app.py`) starts it;
+    web workers use it to submit, cancel and watch jobs through the database.
+    """
+    global _job_queue
+    scraper = get_scraper()
+    with _init_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue(scraper.db, JOB_HANDLERS, workers=scraper.config.get('jobs', {}).get('workers', 2))
+        return _job_queue
+
 def run_weekly_sync():
-    """Finds the current season's CSVs (Light/Dark) and syncs them."""
+    """Finds every target's CSVs for the current season (e.g. Light/Dark) and syncs them."""
     try:
         now = datetime.now()
         year = now.year
@@ -30,87 +60,271 @@ def run_weekly_sync():
             
         current_season_str = f"{season}_{year}" # e.g. Spring_2026
         
-        # Check for both variants
-        variants = ["Light_Side", "Dark_Side"]
-        files_to_sync = []
-        
-        for v in variants:
-            # Format: Automation_Light_Side_Spring_2026.csv
-            filename = f"Automation_{v}_{current_season_str}.csv"
-            filepath = os.path.join("data/automation", filename)
-            if os.path.exists(filepath):
-                files_to_sync.append(filename)
+        # Format: Automation_Light_Side_Spring_2026.csv, in any target's export folder
+        files_to_sync = sorted(name for name in export_listing() if name.endswith(f"_{current_season_str}.csv"))
         
         if files_to_sync:
-            logging.info(f"Weekly Sync: Found {files_to_sync}. Starting sync.")
-            
-            # Helper to run them sequentially
-            def sync_sequence():
-                for f in files_to_sync:
-                    perform_sync(f)
-                    time.sleep(5) # Cooldown between playlists
-
-            threading.Thread(target=sync_sequence).start()
+            logging.info(f"Weekly Sync: Found {files_to_sync}. Queueing sync.")
+            get_job_queue().submit("sync_all", {"files": files_to_sync})
         else:
             logging.info(f"Weekly Sync: No files found for {current_season_str} yet.")
     except Exception as e:
         logging.error(f"Weekly sync failed to trigger: {e}")
 
-def run_schedule():
-    interval = scraper.config.get('polling_interval_minutes', 60)
-    schedule.every(interval).minutes.do(scraper.run_cycle)
-    
-    # Weekly Sync: Sunday at 3 AM
-    schedule.every().sunday.at("03:00").do(run_weekly_sync)
-    
-    logging.info(f"Scheduler started. Polling every {interval} minutes. Weekly sync on Sundays at 03:00.")
-    while True:
-        schedule.run_pending()
-        time.sleep(1)
+AUTH_PATH = "data/auth.json"
+
+YT_DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
+    "Accept": "*/*",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Content-Type": "application/json",
+    "X-Goog-AuthUser": "0",
+    "X-Goog-Visitor-Id": "CgthbHBoYS10ZXN0",
+    "X-Youtube-Client-Name": "67",
+    "X-Youtube-Client-Version": "1.20230705.01.00",
+}
 
-# Start scheduler on launch
-threading.Thread(target=run_schedule, daemon=True).start()
+def with_default_headers(headers):
+    """Adds any of YT_DEFAULT_HEADERS missing from headers (keys compared case-insensitively)."""
+    lower_keys = {k.lower() for k in headers}
+    return {**headers, **{k: v for k, v in YT_DEFAULT_HEADERS.items() if k.lower() not in lower_keys}}
+
+def auth_problem(headers):
+    """Why headers cannot authenticate to YouTube Music, or None if they look usable."""
+    cookie = next((v for k, v in headers.items() if k.lower() == 'cookie'), None)
+    if not cookie:
+        return "Missing 'Cookie' header. Please copy the full request headers."
+    if 'SAPISID' not in cookie and '__Secure-3PAPISID' not in cookie:
+        return "Invalid Cookie: Missing SAPISID. Please recopy headers from a request to music.youtube.com (e.g. 'browse')."
+    return None
+
+# One YTMusic client per process, rebuilt only when auth.json changes. All
+# clients share one pooled session, so connections to YouTube are reused.
+_yt_lock = threading.Lock()
+_yt_client = None
+_yt_session = None
+_yt_state = {"stat": None, "sha256": None, "error": None, "loaded_at": None}
+
+def _auth_stat():
+    try:
+        st = os.stat(AUTH_PATH)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+def _yt_requests_session():
+    global _yt_session
+    if _yt_session is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        # Retries are ours (search_with_backoff, add_items_with_retry); size the pool for parallel searches
+        concurrency = get_scraper().config.get('youtube', {}).get('search_concurrency', 4)
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=concurrency + 2)
+        _yt_session = requests.Session()
+        _yt_session.mount("https://", adapter)
+    return _yt_session
 
 def get_yt_client():
-    if os.path.exists("data/auth.json"):
+    """The shared YTMusic client, or None when auth.json is missing or unusable."""
+    global _yt_client
+    with _yt_lock:
+        stat = _auth_stat()
+        if stat is None:
+            _yt_client = None
+            _yt_state.update(stat=None, sha256=None, error=None)
+            return None
+        if stat == _yt_state["stat"]:
+            return _yt_client
+
         try:
-            with open("data/auth.json") as f:
-                auth = json.load(f)
-            
-            # Helper: Ensure defaults exist even in saved file
-            defaults = {
-                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
-                "Accept": "*/*",
-                "Accept-Language": "en-US,en;q=0.5",
-                "Content-Type": "application/json",
-                "X-Goog-AuthUser": "0",
-                "X-Goog-Visitor-Id": "CgthbHBoYS10ZXN0",
-                "X-Youtube-Client-Name": "67",
-                "X-Youtube-Client-Version": "1.20230705.01.00",
-            }
-            # Case-insensitive update
-            lower_keys = {k.lower(): k for k in auth.keys()}
-            for k, v in defaults.items():
-                if k.lower() not in lower_keys:
-                    auth[k] = v
-
-            return YTMusic(auth)
+            with open(AUTH_PATH, 'rb') as f:
+                raw = f.read()
+            sha256 = hashlib.sha256(raw).hexdigest()
+            # Touched but unchanged: keep the client (and its warm connections)
+            if sha256 == _yt_state["sha256"] and _yt_client is not None:
+                _yt_state["stat"] = stat
+                return _yt_client
+
+            headers = json.loads(raw)
+            problem = auth_problem(headers)
+            if problem:
+                raise ValueError(problem)
+            from ytmusicapi import YTMusic
+            _yt_client = YTMusic(with_default_headers(headers), requests_session=_yt_requests_session())
+            _yt_state.update(stat=stat, sha256=sha256, error=None, loaded_at=datetime.now().isoformat(timespec='seconds'))
+            logging.info("Loaded YouTube Music credentials")
         except Exception as e:
             logging.error(f"Failed to load YTMusic: {e}")
-    return None
+            metrics.record_error('youtube_auth', e)
+            _yt_client = None
+            _yt_state.update(stat=stat, sha256=None, error=str(e), loaded_at=None)
+        return _yt_client
 
-TASKS = {
-    "backfill": {"status": "idle", "progress": 0, "message": ""},
-    "sync": {"status": "idle", "progress": 0, "message": ""}
-}
+def yt_auth_health():
+    """
+    {configured, valid, error, loaded_at} for the dashboard. Answered from the
+    cached client, or by checking auth.json's headers; never builds a client.
+    """
+    stat = _auth_stat()
+    if stat is None:
+        return {"configured": False, "valid": False, "error": None, "loaded_at": None}
+    with _yt_lock:
+        if stat == _yt_state["stat"]:
+            return {"configured": True, "valid": _yt_client is not None,
+                    "error": _yt_state["error"], "loaded_at": _yt_state["loaded_at"]}
+    try:
+        with open(AUTH_PATH) as f:
+            error = auth_problem(json.load(f))
+    except (OSError, ValueError) as e:
+        error = f"Unreadable auth.json: {e}"
+    return {"configured": True, "valid": error is None, "error": error, "loaded_at": None}
+
+# Shared across all sync threads so concurrent syncs respect one rate limit
+_search_limiter = None
+_search_breaker = None
+_throttle_lock = threading.Lock()
+
+def get_search_throttle():
+    global _search_limiter, _search_breaker
+    scraper = get_scraper()
+    with _throttle_lock:
+        if _search_limiter is None:
+            yt_cfg = scraper.config.get('youtube', {})
+            breaker_cfg = yt_cfg.get('circuit_breaker', {})
+            _search_limiter = TokenBucket(yt_cfg.get('search_rate_per_second', 3), yt_cfg.get('search_burst', 5))
+            _search_breaker = CircuitBreaker(breaker_cfg.get('failure_threshold', 5), breaker_cfg.get('cooldown_seconds', 60))
+        return _search_limiter, _search_breaker
+
+def search_with_backoff(yt, query):
+    """yt.search behind the shared rate limiter, retrying 429/5xx with exponential backoff."""
+    scraper = get_scraper()
+    limiter, breaker = get_search_throttle()
+    retries = scraper.config.get('youtube', {}).get('search_retries', 4)
+    for attempt in range(retries + 1):
+        breaker.wait()
+        limiter.acquire()
+        try:
+            with metrics.YOUTUBE_SEARCH_SECONDS.time():
+                results = yt.search(query, filter="songs")
+            breaker.record_success()
+            limiter.reward()
+            return results
+        except Exception as e:
+            metrics.record_error('youtube_search', e)
+            if not is_retryable(e) or attempt == retries:
+                raise
+            breaker.record_failure()
+            limiter.penalize()
+            delay = min(60, 2 ** attempt) + random.uniform(0, 1)
+            logging.warning(f"Search throttled ({str(e).strip()}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def search_cached(yt, artist, song):
+    """
+    Resolves (artist, song) to a videoId, consulting the persistent search cache first.
+    Returns None when YouTube Music has no match.
+    """
+    from scraper import canonical_track_key
+    scraper = get_scraper()
+    cache_cfg = scraper.config.get('youtube', {}).get('search_cache', {})
+    track_key = canonical_track_key(artist, song)
+
+    hit, video_id = scraper.db.get_search_result(track_key, cache_cfg.get('negative_ttl_hours', 168))
+    metrics.SEARCH_CACHE_LOOKUPS.inc(result="hit" if hit else "miss")
+    if hit:
+        return video_id
+
+    search_results = search_with_backoff(yt, f"{artist} {song}")
+    video_id = search_results[0]['videoId'] if search_results else None
+    scraper.db.save_search_result(track_key, video_id)
+    return video_id
+
+# The library index is refreshed at most this often, so a sync-all over many
+# new seasons does not re-list the whole library for every file
+LIBRARY_REFRESH_SECONDS = 600
+_library_lock = threading.Lock()
+_library_refreshed_at = None
+
+def resolve_playlist(yt, title, filename=None):
+    """
+    Returns (playlist_id, created) for title, using the yt_playlists index. On a
+    miss the full library is listed (all pages) into the index before a new
+    playlist is created, so titles beyond the first page are still found.
+    """
+    global _library_refreshed_at
+    scraper = get_scraper()
+    # One lookup at a time: concurrent syncs share a single library listing
+    with _library_lock:
+        playlist_id = scraper.db.get_yt_playlist(title)
+        if playlist_id:
+            logging.info(f"Reusing existing playlist {playlist_id}")
+            return playlist_id, False
+
+        if _library_refreshed_at is None or time.monotonic() - _library_refreshed_at > LIBRARY_REFRESH_SECONDS:
+            try:
+                library = yt.get_library_playlists(limit=None)
+                scraper.db.save_yt_playlists((p['title'], p['playlistId']) for p in library if p.get('playlistId'))
+                _library_refreshed_at = time.monotonic()
+                logging.info(f"Indexed {len(library)} library playlists")
+            except Exception as e:
+                logging.warning(f"Could not fetch existing playlists: {e}")
+
+            playlist_id = scraper.db.get_yt_playlist(title)
+            if playlist_id:
+                scraper.db.save_yt_playlists([(title, playlist_id)], filename)
+                logging.info(f"Reusing existing playlist {playlist_id}")
+                return playlist_id, False
+
+        playlist_id = yt.create_playlist(title=title, description="Synced from WUOG Scraper")
+        scraper.db.save_yt_playlists([(title, playlist_id)], filename)
+        logging.info(f"Created new playlist {playlist_id}")
+        return playlist_id, True
+
+def add_items_with_retry(yt, playlist_id, video_ids, retries):
+    """
+    yt.add_playlist_items with exponential backoff. Before a retry the playlist is
+    re-read, so items that landed despite the error are not sent twice.
+    """
+    for attempt in range(retries + 1):
+        try:
+            result = yt.add_playlist_items(playlist_id, video_ids)
+            status = result.get('status') if isinstance(result, dict) else None
+            if status and status != 'STATUS_SUCCEEDED':
+                raise Exception(f"add_playlist_items returned {status}")
+            return
+        except Exception as e:
+            metrics.record_error('youtube_add', e)
+            if attempt == retries:
+                raise
+            delay = min(60, 2 ** attempt) + random.uniform(0, 1)
+            logging.warning(f"Adding {len(video_ids)} items failed ({str(e).strip()}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+        try:
+            remote = yt.get_playlist(playlist_id, limit=None)
+            present = {t['videoId'] for t in remote.get('tracks', []) if t.get('videoId')}
+            video_ids = [v for v in video_ids if v not in present]
+        except Exception as e:
+            logging.warning(f"Could not re-read playlist {playlist_id} before retrying: {e}")
+        if not video_ids:
+            return
 
-def _process_sync(yt, filename, set_status):
+def _process_sync(yt, filename, set_status, resume_keys=(), save_checkpoint=None):
     """
     Core sync logic.
     set_status: function(message, progress_percent)
+    resume_keys / save_checkpoint(keys): track keys an interrupted run already pushed,
+    and a callback receiving all pushed keys after each chunk. Rows are matched by
+    track key, not position, since the CSV is rewritten newest-first as plays arrive.
+    Incremental syncs need neither: the synced_tracks ledger records every chunk.
     """
+    from scraper import canonical_track_key
+    scraper = get_scraper()
     try:
-        filepath = os.path.join("data/automation", filename)
+        entry = export_listing().get(filename)
+        if entry is None:
+            raise FileNotFoundError(f"{filename} is not an exported CSV")
+        filepath = os.path.join(entry['folder'], filename)
         
         # Naming: WUOG {Clean Name}
         # e.g., Automation_Light_Side_Spring_2026.csv -> WUOG Light Side Spring 2026
@@ -120,25 +334,28 @@ def _process_sync(yt, filename, set_status):
         logging.info(f"Starting YT Sync for {playlist_title}...")
         
         # Check/Create Playlist
-        playlist_id = None
-        try:
-            existing_playlists = yt.get_library_playlists(limit=50)
-            for p in existing_playlists:
-                if p['title'] == playlist_title:
-                    playlist_id = p['playlistId']
-                    logging.info(f"Reusing existing playlist {playlist_id}")
-                    break
-        except Exception as e:
-            logging.warning(f"Could not fetch existing playlists: {e}")
-
-        if not playlist_id:
-            playlist_id = yt.create_playlist(title=playlist_title, description="Synced from WUOG Scraper")
-            logging.info(f"Created new playlist {playlist_id}")
+        playlist_id, created = resolve_playlist(yt, playlist_title, filename)
+
+        incremental = scraper.config.get('youtube', {}).get('incremental', True)
+
+        # Incremental mode: rows already pushed to this playlist are skipped without searching.
+        # The first time we see a playlist that exists remotely but not in our ledger,
+        # we read its contents once so already-present videos are not pushed again.
+        synced = scraper.db.get_synced_tracks(playlist_id) if incremental else {}
+        video_ids_seen = set(synced.values())
+        resume_keys = set(resume_keys)
+        if incremental and not synced and not created:
+            set_status("Reading existing playlist...", 5)
+            try:
+                remote = yt.get_playlist(playlist_id, limit=None)
+                video_ids_seen.update(t['videoId'] for t in remote.get('tracks', []) if t.get('videoId'))
+            except Exception as e:
+                logging.warning(f"Could not read playlist {playlist_id}: {e}")
         
         set_status("Reading songs...", 10)
         
-        songs_to_add = []
-        video_ids_seen = set()
+        # (csv_row, track_key, video_id, push) for every matched row, in CSV order
+        plan = []
         
         # Ensure UTF-8 reading
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -149,174 +366,511 @@ def _process_sync(yt, filename, set_status):
                 set_status("Error: CSV file is empty.", 100)
                 return False, "CSV file is empty"
 
+            already_pushed = resume_keys.union(synced)
+            pending = [(i, row) for i, row in enumerate(rows)
+                       if canonical_track_key(row['Artist'], row['Song']) not in already_pushed]
+            skipped = total_songs - len(pending)
+            if skipped:
+                logging.info(f"{skipped} of {total_songs} rows already synced to {playlist_title}")
+
+            # Search concurrently; results are collected by index so CSV order is kept
+            concurrency = scraper.config.get('youtube', {}).get('search_concurrency', 4)
+            results = [None] * len(pending)
             hits = 0
-            for i, row in enumerate(rows):
-                progress = 10 + int((i / total_songs) * 80) # 10% to 90%
-                set_status(f"Searching ({hits}/{i+1}): {row['Song']}", progress)
-                
-                query = f"{row['Artist']} {row['Song']}"
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+                futures = {pool.submit(search_cached, yt, row['Artist'], row['Song']): n for n, (_, row) in enumerate(pending)}
                 try:
-                    search_results = yt.search(query, filter="songs")
-                    if search_results:
-                        video_id = search_results[0]['videoId']
-                        # Double-check deduplication (avoid adding same video twice in one sync)
-                        if video_id not in video_ids_seen:
-                            songs_to_add.append(video_id)
-                            video_ids_seen.add(video_id)
-                            hits += 1
-                except Exception as e:
-                    logging.warning(f"Search failed for {query}: {e}")
+                    for done, future in enumerate(as_completed(futures), start=1):
+                        n = futures[future]
+                        row = pending[n][1]
+                        try:
+                            results[n] = future.result()
+                            if results[n]:
+                                hits += 1
+                        except Exception as e:
+                            logging.warning(f"Search failed for {row['Artist']} {row['Song']}: {e}")
+                        progress = 10 + int((done / len(pending)) * 80) # 10% to 90%
+                        set_status(f"Searching ({hits}/{done}): {row['Song']}", progress)
+                except BaseException:
+                    # Cancelled: drop the searches that have not started yet
+                    for future in futures:
+                        future.cancel()
+                    raise
+
+            for (row_index, row), video_id in zip(pending, results):
+                if video_id:
+                    # Double-check deduplication (avoid adding same video twice in one sync)
+                    plan.append((row_index, canonical_track_key(row['Artist'], row['Song']), video_id, video_id not in video_ids_seen))
+                    video_ids_seen.add(video_id)
+
+        # Keep the search cache bounded; pending hits first, so eviction sees their last_used
+        scraper.db.flush_search_hits()
+        max_entries = scraper.config.get('youtube', {}).get('search_cache', {}).get('max_entries', 50000)
+        evicted = scraper.db.prune_search_cache(max_entries)
+        if evicted:
+            logging.info(f"Evicted {evicted} entries from the search cache")
+
+        to_push = [entry for entry in plan if entry[3]]
+        not_found = len(pending) - len(plan)
+        skipped += len(plan) - len(to_push)
         
-        if not songs_to_add:
+        if not to_push:
+            if (incremental and (skipped or plan)) or (resume_keys and not pending):
+                if incremental:
+                    scraper.db.record_synced_tracks(playlist_id, [(key, video_id) for _, key, video_id, _ in plan])
+                set_status("Complete! Playlist already up to date.", 100)
+                return True, None
             set_status("Failed: No songs found on YT Music.", 100)
             return False, "No matches found on YouTube Music"
 
-        set_status(f"Adding {len(songs_to_add)} songs...", 90)
-        
-        # Add in batches of 50 just in case (though library handles it, safer)
-        # ytmusicapi usually handles lists fine, but large lists can timeout
-        try:
-             yt.add_playlist_items(playlist_id, songs_to_add)
-        except Exception as e:
-             logging.error(f"Failed to add items: {e}")
-             set_status(f"Error adding to playlist: {str(e)}", 100)
-             return False, str(e)
-            
-        set_status(f"Complete! Added {len(songs_to_add)} songs.", 100)
+        # Push in chunks (large single calls time out). Each chunk that lands is
+        # recorded in the ledger and checkpoint before the next one is sent, so a
+        # failed sync resumes after the last committed chunk without re-searching.
+        yt_cfg = scraper.config.get('youtube', {})
+        chunk_size = max(1, yt_cfg.get('add_chunk_size', 50))
+        add_retries = yt_cfg.get('add_retries', 3)
+        pushed = committed = 0
+        for start in range(0, len(to_push), chunk_size):
+            chunk = to_push[start:start + chunk_size]
+            set_status(f"Adding songs ({pushed}/{len(to_push)})...", 90 + int(start / len(to_push) * 10))
+            try:
+                add_items_with_retry(yt, playlist_id, [video_id for _, _, video_id, _ in chunk], add_retries)
+            except Exception as e:
+                failed = len(to_push) - pushed
+                logging.error(f"Failed to add items to {playlist_title}: {e} "
+                              f"(pushed {pushed}, skipped {skipped}, failed {failed}, not found {not_found})")
+                set_status(f"Error adding to playlist after {pushed} songs: {str(e)}", 100)
+                return False, f"Added {pushed} songs, {failed} failed: {str(e).strip()}"
+            pushed += len(chunk)
+
+            # Everything up to this chunk's last CSV row is now in the playlist
+            last_row = chunk[-1][0]
+            upto = committed
+            while upto < len(plan) and plan[upto][0] <= last_row:
+                upto += 1
+            if incremental:
+                scraper.db.record_synced_tracks(playlist_id, [(key, video_id) for _, key, video_id, _ in plan[committed:upto]])
+            committed = upto
+            if save_checkpoint and not incremental:
+                save_checkpoint(sorted(resume_keys.union(key for _, key, _, _ in plan[:committed])))
+
+        # Rows after the last pushed one that matched videos already in the playlist
+        if incremental and committed < len(plan):
+            scraper.db.record_synced_tracks(playlist_id, [(key, video_id) for _, key, video_id, _ in plan[committed:]])
+
+        logging.info(f"Synced {playlist_title}: pushed {pushed}, skipped {skipped}, failed 0, not found {not_found}")
+        set_status(f"Complete! Added {pushed} songs ({skipped} skipped, {not_found} not found).", 100)
         return True, None
     except Exception as e:
         err_msg = str(e)
         if "concatenate" in str(e) and "NoneType" in str(e):
              err_msg = "Invalid Auth: Cookie missing SAPISID. Please recopy headers."
         logging.error(f"Sync failed for {filename}: {e}")
+        metrics.record_error('sync', e)
         return False, err_msg
 
-def perform_sync(filename):
-    """Wrapper for single playlist sync."""
-    if TASKS["sync"]["status"] == "running":
-        return
-
+def run_sync_job(job):
+    """Job handler: syncs one CSV, resuming after the last pushed chunk."""
     yt = get_yt_client()
     if not yt:
-        logging.error("Cannot sync: YouTube not configured.")
-        return
-
-    TASKS["sync"]["status"] = "running"
-    
-    def status_cb(msg, prog):
-        TASKS["sync"]["message"] = msg
-        TASKS["sync"]["progress"] = prog
-        
-    success, error = _process_sync(yt, filename, status_cb)
-    
-    if success:
-        TASKS["sync"]["status"] = "complete"
-    else:
-        TASKS["sync"]["status"] = "error"
-        TASKS["sync"]["message"] = error
-    
-    time.sleep(5)
-    TASKS["sync"]["status"] = "idle"
-
-def perform_sync_all():
-    """Wrapper for batch sync."""
-    if TASKS["sync"]["status"] == "running":
-        return
-
+        raise RuntimeError("YouTube Music not configured")
+
+    success, error = _process_sync(
+        yt, job.params['filename'], job.set_status,
+        resume_keys=job.checkpoint.get('pushed', []),
+        save_checkpoint=lambda keys: job.save_checkpoint(pushed=keys),
+    )
+    if not success:
+        raise RuntimeError(error)
+    return job.message
+
+def run_sync_all_job(job):
+    """Job handler: syncs every CSV (or params['files']) in turn, resuming at the file and chunk reached."""
     yt = get_yt_client()
     if not yt:
-        return
+        raise RuntimeError("YouTube Music not configured")
+
+    # The file list is fixed when the job first runs so a resume walks the same list
+    files = job.checkpoint.get('files')
+    if files is None:
+        files = job.params.get('files')
+        if files is None:
+            files = sorted(export_listing(), reverse=True)
+        job.save_checkpoint(files=files, file_index=0, pushed=[])
+
+    total_files = len(files)
+    failed = []
+    for idx in range(job.checkpoint.get('file_index', 0), total_files):
+        filename = files[idx]
+        file_num = idx + 1
+
+        def status_cb(msg, prog):
+            # Scale inner progress to overall progress
+            overall = int(((idx) / total_files * 100) + (prog / total_files))
+            job.set_status(f"[{file_num}/{total_files}] {filename}: {msg}", overall)
+
+        success, error = _process_sync(
+            yt, filename, status_cb,
+            resume_keys=job.checkpoint.get('pushed', []),
+            save_checkpoint=lambda keys: job.save_checkpoint(pushed=keys),
+        )
+        if not success:
+            failed.append(filename)
+        job.save_checkpoint(file_index=idx + 1, pushed=[])
+
+    if failed:
+        return f"Batch Sync Complete! {len(failed)} of {total_files} files failed."
+    return "Batch Sync Complete!"
+
+def run_backfill_job(job):
+    """Job handler: gap-repair crawl of every target, checkpointing the last fully saved page."""
+    scraper = get_scraper()
+    pages = job.params['pages']
+    targets = scraper.config['targets']
+    start_index = job.checkpoint.get('target_index', 0)
+
+    for index in range(start_index, len(targets)):
+        target = targets[index]
+        start_page = job.checkpoint.get('page', 0) + 1 if index == start_index else 1
+
+        def on_page(page_num, completed):
+            if (index, completed) != (job.checkpoint.get('target_index'), job.checkpoint.get('page')):
+                job.save_checkpoint(target_index=index, page=completed)
+            if page_num is not None:
+                job.report(f"{target['name']}: page {page_num}/{pages}", (index + (page_num - 1) / pages) / len(targets) * 100)
+
+        # process_target stops and saves what is already running; we raise once it returns
+        scraper.process_target(target, max_pages=pages, gap_repair=True, start_page=start_page,
+                               on_page=on_page, should_stop=job.cancel_requested)
+        job.raise_if_cancelled()
+        job.save_checkpoint(target_index=index + 1, page=0)
+
+    return "Backfill complete!"
+
+JOB_HANDLERS = {
+    "backfill": ("backfill", run_backfill_job),
+    "sync": ("sync", run_sync_job),
+    "sync_all": ("sync", run_sync_all_job),
+}
 
-    TASKS["sync"]["status"] = "running"
-    TASKS["sync"]["message"] = "Starting Batch Sync..."
-    TASKS["sync"]["progress"] = 0
-    
-    data_dir = "data/automation"
-    if os.path.exists(data_dir):
-        files = sorted([f for f in os.listdir(data_dir) if f.endswith(".csv")], reverse=True)
-        total_files = len(files)
-        
-        for idx, filename in enumerate(files):
-            file_num = idx + 1
-            TASKS["sync"]["message"] = f"File {file_num}/{total_files}: {filename}"
-            
-            def status_cb(msg, prog):
-                # Scale inner progress to overall progress
-                # overall = int(((idx) / total_files * 100) + (prog / total_files))
-                overall = int(((idx) / total_files * 100) + (prog / total_files))
-                TASKS["sync"]["progress"] = overall
-                TASKS["sync"]["message"] = f"[{file_num}/{total_files}] {filename}: {msg}"
-            
-            _process_sync(yt, filename, status_cb)
-            
-    TASKS["sync"]["status"] = "complete"
-    TASKS["sync"]["message"] = "Batch Sync Complete!"
-    TASKS["sync"]["progress"] = 100
-    
-    time.sleep(10)
-    TASKS["sync"]["status"] = "idle"
+def task_summary(jobs, lane):
+    """
+    The per-lane {status, progress, message} shape the dashboard shows: the active
+    job, else one that finished in the last 10 seconds, else idle.
+    """
+    for job in jobs:
+        if job['lane'] == lane and job['status'] in ('running', 'queued'):
+            message = job['message'] if job['status'] == 'running' else "Queued..."
+            return {"status": "running", "progress": job['progress'], "message": message}
+    for job in jobs:
+        if job['lane'] == lane and job['finished_at']:
+            if (datetime.now() - datetime.fromisoformat(job['finished_at'])).total_seconds() < 10:
+                status = job['status'] if job['status'] != 'cancelled' else 'idle'
+                return {"status": status, "progress": job['progress'], "message": job['message']}
+            break
+    return {"status": "idle", "progress": 0, "message": ""}
+
+# Parsed manifests, keyed by path and reused until the file's mtime changes
+_manifest_cache = {}
+
+# Gzipped CSV bodies keyed by content hash, least recently used evicted first
+GZIP_CACHE_BYTES = 32 * 1024 * 1024
+_gzip_cache = OrderedDict()
+_gzip_lock = threading.Lock()
+
+def load_manifest(folder):
+    from scraper import MANIFEST_NAME
+    scraper = get_scraper()
+    path = os.path.join(folder, MANIFEST_NAME)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        if not os.path.isdir(folder):
+            return {}
+        # Folder exported before manifests existed
+        scraper.write_manifest(folder)
+        mtime = os.stat(path).st_mtime_ns
+
+    cached = _manifest_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding='utf-8') as f:
+        manifest = json.load(f)
+    _manifest_cache[path] = (mtime, manifest)
+    return manifest
+
+def export_listing():
+    """{filename: manifest entry plus its folder} across every target's export folder."""
+    scraper = get_scraper()
+    listing = {}
+    for folder in dict.fromkeys(t['export_folder'] for t in scraper.config['targets']):
+        for name, entry in load_manifest(folder).get('files', {}).items():
+            listing[name] = dict(entry, folder=folder)
+    return listing
+
+def gzipped(checksum, path):
+    with _gzip_lock:
+        body = _gzip_cache.get(checksum)
+        if body is not None:
+            _gzip_cache.move_to_end(checksum)
+            return body
+
+    with open(path, 'rb') as f:
+        body = gzip.compress(f.read(), compresslevel=6)
+
+    with _gzip_lock:
+        _gzip_cache[checksum] = body
+        while sum(len(b) for b in _gzip_cache.values()) > GZIP_CACHE_BYTES and len(_gzip_cache) > 1:
+            _gzip_cache.popitem(last=False)
+    return body
 
 @app.route('/')
 def index():
-    # List CSV files
-    data_dir = "data/automation" # TODO: Make dynamic based on targets
     files = []
-    if os.path.exists(data_dir):
-        for f in os.listdir(data_dir):
-            if f.endswith(".csv"):
-                size = os.path.getsize(os.path.join(data_dir, f))
-                # Convert size to readable format
-                readable_size = f"{size / 1024:.1f} KB"
-                files.append({"name": f, "size": readable_size})
-    
+    for name, entry in export_listing().items():
+        files.append({
+            "name": name,
+            "size": f"{entry['size'] / 1024:.1f} KB",
+            "rows": entry['rows'],
+            "target": entry['target'],
+        })
+
     # Sort by name (descending roughly gives newest months first)
     files.sort(key=lambda x: x['name'], reverse=True)
     return render_template('index.html', files=files)
 
 @app.route('/download/<filename>')
 def download_file(filename):
-    return send_from_directory('data/automation', filename, as_attachment=True)
+    """
+    Serves an exported CSV listed in a manifest. The content hash is the ETag, so
+    repeat downloads get a 304; Range requests get the raw file, otherwise the
+    body is gzipped for clients that accept it.
+    """
+    entry = export_listing().get(filename)
+    if entry is None:
+        abort(404)
+    path = os.path.join(entry['folder'], filename)
+
+    if 'gzip' in request.headers.get('Accept-Encoding', '') and 'Range' not in request.headers:
+        response = Response(mimetype='text/csv')
+        response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response.set_etag(f"{entry['sha256']}-gzip")
+        response.last_modified = entry['mtime']
+        response.make_conditional(request)
+        # Only read and compress the file when the body is actually sent, not for a 304
+        if response.status_code != 304:
+            response.set_data(gzipped(entry['sha256'], path))
+    else:
+        response = send_file(os.path.abspath(path), mimetype='text/csv', as_attachment=True,
+                             etag=entry['sha256'], last_modified=entry['mtime'])
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
 
 @app.route('/backfill', methods=['POST'])
 def backfill():
-    if TASKS["backfill"]["status"] == "running":
-        return jsonify({"success": False, "message": "Backfill already running"})
-
     try:
         pages = int(request.form.get('pages', 5))
-        TASKS["backfill"]["status"] = "running"
-        TASKS["backfill"]["message"] = "Starting..."
-        TASKS["backfill"]["progress"] = 0
-        
-        def run_backfill():
-            try:
-                # We can't easily track precise progress inside Scraper without refactoring it heavily
-                # So we fake it slightly or just show "Running"
-                TASKS["backfill"]["message"] = f"Scraping {pages} pages..."
-                for target in scraper.config['targets']:
-                    scraper.process_target(target, max_pages=pages)
-                TASKS["backfill"]["status"] = "complete"
-                TASKS["backfill"]["message"] = "Backfill complete!"
-            except Exception as e:
-                TASKS["backfill"]["status"] = "error"
-                TASKS["backfill"]["message"] = str(e)
-            
-            # Reset after a delay
-            time.sleep(10)
-            TASKS["backfill"]["status"] = "idle"
-        
-        threading.Thread(target=run_backfill).start()
-        return jsonify({"success": True, "message": "Backfill started"})
+        job_id = get_job_queue().submit("backfill", {"pages": pages})
+        return jsonify({"success": True, "message": "Backfill queued", "job_id": job_id})
     except Exception as e:
         return jsonify({"success": False, "message": str(e)})
 
+def status_snapshot():
+    scraper = get_scraper()
+    jobs = scraper.db.list_jobs()
+    # Searches run in the worker process, so their counts come from the database
+    counters = scraper.db.get_counters()
+    return {
+        "yt_configured": os.path.exists(AUTH_PATH),
+        "yt_auth": yt_auth_health(),
+        "tasks": {
+            "backfill": task_summary(jobs, "backfill"),
+            "sync": task_summary(jobs, "sync"),
+        },
+        "jobs": jobs,
+        "search_cache": {
+            "hits": counters.get('search_cache_hits', 0),
+            "misses": counters.get('search_cache_misses', 0),
+            "entries": scraper.db.search_cache_size()
+        }
+    }
+
 @app.route('/api/status')
 def status():
+    return jsonify(status_snapshot())
+
+@app.route('/api/events')
+def events():
+    """
+    Server-Sent Events: pushes the /api/status snapshot whenever a job changes.
+    Idle connections sleep on the job queue's condition and only send a
+    keep-alive comment every 15 seconds.
+    """
+    queue = get_job_queue()
+
+    def stream():
+        yield "retry: 5000\n\n"
+        version, last = queue.version, None
+        while True:
+            snapshot = status_snapshot()
+            payload = json.dumps(snapshot, default=str)
+            if payload != last:
+                yield f"data: {payload}\n\n"
+                last = payload
+            else:
+                yield ": keep-alive\n\n"
+            # A just-finished task flips back to idle after 10s, so re-check sooner
+            recent = any(task["status"] in ("complete", "error") for task in snapshot["tasks"].values())
+            version = queue.wait_for_change(version, timeout=1 if recent else 15)
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/plays')
+def plays():
+    """
+    Play history, newest first. Query args: target, start / end (ISO dates, end
+    inclusive), dj, show, q (full-text over artist/song/album), limit (max 500)
+    and cursor (next_cursor from the previous page).
+    """
+    scraper = get_scraper()
+    try:
+        limit = min(max(int(request.args.get('limit', 50)), 1), 500)
+        # Bare dates stay dates so they also match plays stored without a time
+        start = request.args.get('start')
+        if start:
+            start_dt = datetime.fromisoformat(start)
+            start = start_dt.date().isoformat() if len(start) == 10 else start_dt.isoformat()
+        end = request.args.get('end')
+        if end:
+            end_dt = datetime.fromisoformat(end)
+            # A bare end date includes that whole day
+            end = (end_dt + timedelta(days=1)).date().isoformat() if len(end) == 10 else end_dt.isoformat()
+        after = None
+        if request.args.get('cursor'):
+            after = json.loads(base64.urlsafe_b64decode(request.args['cursor']))
+            if not (isinstance(after, list) and len(after) == 2
+                    and isinstance(after[0], str) and type(after[1]) is int):
+                raise ValueError("cursor is not a next_cursor from this endpoint")
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Bad query parameter: {e}"}), 400
+
+    rows = scraper.db.search_plays(
+        target_name=request.args.get('target'), start_date=start, end_date=end,
+        dj=request.args.get('dj'), show=request.args.get('show'), query=request.args.get('q'),
+        limit=limit, after=after,
+    )
+    next_cursor = None
+    if len(rows) == limit:
+        last = rows[-1]
+        next_cursor = base64.urlsafe_b64encode(json.dumps([last['play_datetime'], last['id']]).encode()).decode()
+    return jsonify({"plays": rows, "next_cursor": next_cursor})
+
+@app.route('/api/stats')
+def stats():
+    """
+    Rotation statistics from the rollup tables. Query args: target (default the
+    first), season ("Fall_2026", default the current one, or "all") and limit
+    for the top-artist and top-track lists.
+    """
+    scraper = get_scraper()
+    targets = {t['name']: t for t in scraper.config['targets']}
+    target = targets.get(request.args.get('target') or next(iter(targets), None))
+    if target is None:
+        return jsonify({"error": "Unknown target"}), 404
+
+    now = datetime.now()
+    season = request.args.get('season') or f"{'Spring' if now.month <= 7 else 'Fall'}_{now.year}"
+    start_month = end_month = None
+    if season != 'all':
+        start, end = scraper.bucket_range({}, season)
+        if start is None or not season.startswith(('Spring_', 'Fall_')):
+            return jsonify({"error": "season must look like Spring_2026, Fall_2026 or all"}), 400
+        start_month, end_month = start[:7], end[:7]
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+
+    per_hour = [0] * 24
+    unknown_hour = 0
+    mix = {}
+    time_filter = target.get('time_filter') or {}
+    for month, hour, count in scraper.db.plays_by_month_hour(target['name'], start_month, end_month):
+        if hour < 0:
+            unknown_hour += count
+        else:
+            per_hour[hour] += count
+        # Same rule as the export buckets: unknown times count as Dark_Side
+        light = bool(time_filter) and time_filter['start'] <= hour < time_filter['end']
+        month_mix = mix.setdefault(month, {"month": month, "light_side": 0, "dark_side": 0})
+        month_mix["light_side" if light else "dark_side"] += count
+
     return jsonify({
-        "yt_configured": os.path.exists("data/auth.json"),
-        "tasks": TASKS
+        "target": target['name'],
+        "season": season,
+        "top_artists": [{"artist": artist, "plays": count}
+                        for artist, count in scraper.db.top_artists(target['name'], start_month, end_month, limit)],
+        "top_tracks": [{"artist": artist, "song": song, "plays": count}
+                       for artist, song, count in scraper.db.top_tracks(target['name'], start_month, end_month, limit)],
+        "plays_per_hour": per_hour,
+        "plays_unknown_hour": unknown_hour,
+        "variant_mix": list(mix.values()) if time_filter else [],
     })
 
+@app.route('/api/changes')
+def changes():
+    """
+    Plays inserted after ?since= (the X-Next-Cursor of an earlier response or
+    snapshot; 0 for everything), oldest first, as NDJSON. Optional target filter.
+    The stream stops at the newest play when the request arrived, so it costs
+    time proportional to the delta.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({"error": "since must be a cursor from X-Next-Cursor"}), 400
+    scraper = get_scraper()
+    upto = scraper.db.max_song_id()
+    batches = scraper.db.play_batches_since(since, upto, request.args.get('target'))
+
+    def stream():
+        for batch in batches:
+            yield ''.join(json.dumps(play) + '\n' for play in batch)
+
+    response = Response(stream_with_context(stream()), mimetype='application/x-ndjson')
+    response.headers['X-Next-Cursor'] = str(max(since, upto))
+    return response
+
+# One snapshot build at a time; concurrent requests wait and reuse it
+_snapshot_lock = threading.Lock()
+
+@app.route('/api/snapshot')
+def snapshot():
+    """
+    Every play as gzipped NDJSON (the /api/changes format), for bootstrapping a
+    consumer; continue with /api/changes?since=<X-Next-Cursor>. Rebuilt at most
+    hourly, so it can lag a little behind the change feed.
+    """
+    scraper = get_scraper()
+    with _snapshot_lock:
+        path, cursor = scraper.export_snapshot(os.path.dirname(os.path.abspath(scraper.config['database_path'])))
+    response = send_file(path, mimetype='application/gzip', as_attachment=True,
+                         download_name=os.path.basename(path), etag=str(cursor))
+    response.headers['X-Next-Cursor'] = str(cursor)
+    return response
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    if not get_job_queue().cancel(job_id):
+        return jsonify({"success": False, "message": "Job not found or already finished."}), 404
+    return jsonify({"success": True, "message": f"Cancelling job {job_id}"})
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/config/youtube', methods=['POST'])
 def config_youtube():
     try:
@@ -331,52 +885,24 @@ def config_youtube():
             # We can try to be smart, but for now just tell them to use JSON.
             return jsonify({"success": False, "error": "Invalid JSON format. Please paste the JSON object extracted from the network tab."})
 
-        # 2. Case-Insensitive Normalization of keys
-        # We prefer Title-Case for standard headers, but 'cookie' works too.
-        # Let's rebuild a clean dictionary.
-        normalized = {}
-        for k, v in headers_json.items():
-            normalized[k] = v
-        
-        # Check Cookie specifically (case-insensitive search)
-        cookie_val = None
-        for k, v in normalized.items():
-            if k.lower() == 'cookie':
-                cookie_val = v
-                break
-        
-        if not cookie_val:
-             return jsonify({"success": False, "error": "Missing 'Cookie' header. Please copy the full request headers."})
-        
-        if 'SAPISID' not in cookie_val and '__Secure-3PAPISID' not in cookie_val:
-             return jsonify({"success": False, "error": "Invalid Cookie: Missing SAPISID. Please recopy headers from a request to music.youtube.com (e.g. 'browse')."})
+        # 2. Check the Cookie (case-insensitive search)
+        error = auth_problem(headers_json)
+        if error:
+            return jsonify({"success": False, "error": error})
 
         # 3. Inject Defaults if missing
-        defaults = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:109.0) Gecko/20100101 Firefox/115.0",
-            "Accept": "*/*",
-            "Accept-Language": "en-US,en;q=0.5",
-            "Content-Type": "application/json",
-            "X-Goog-AuthUser": "0",
-            "X-Goog-Visitor-Id": "CgthbHBoYS10ZXN0",
-            "X-Youtube-Client-Name": "67",
-            "X-Youtube-Client-Version": "1.20230705.01.00",
-        }
-        
-        lower_keys = {k.lower(): k for k in normalized.keys()}
-        for k, v in defaults.items():
-            if k.lower() not in lower_keys:
-                normalized[k] = v
+        normalized = with_default_headers(headers_json)
 
         # 4. Verify Initialization
         try:
+            from ytmusicapi import YTMusic
             YTMusic(normalized)
         except Exception as e:
              return jsonify({"success": False, "error": f"Auth Verification Failed: {str(e)}. Tip: Try copying headers from the 'browse' or 'landing' request."})
 
         # Ensure directory exists
         os.makedirs("data", exist_ok=True)
-        with open("data/auth.json", "w") as f:
+        with open(AUTH_PATH, "w") as f:
             json.dump(normalized, f)
             
         return jsonify({"success": True})
@@ -385,31 +911,31 @@ def config_youtube():
 
 @app.route('/sync/youtube/<filename>', methods=['POST'])
 def sync_youtube(filename):
-    if TASKS["sync"]["status"] == "running":
-        return jsonify({"message": "A sync job is already running."}), 400
-
-    yt = get_yt_client()
-    if not yt:
+    if not yt_auth_health()["valid"]:
         return jsonify({"message": "YouTube Music not configured! Configure it first."}), 400
 
-    threading.Thread(target=perform_sync, args=(filename,)).start()
-    return jsonify({"success": True, "message": f"Sync started for {filename}"})
+    job_id = get_job_queue().submit("sync", {"filename": filename})
+    return jsonify({"success": True, "message": f"Sync queued for {filename}", "job_id": job_id})
 
 @app.route('/sync/all', methods=['POST'])
 def sync_all():
-    if TASKS["sync"]["status"] == "running":
-        return jsonify({"message": "A sync job is already running."}), 400
-        
-    yt = get_yt_client()
-    if not yt:
+    if not yt_auth_health()["valid"]:
         return jsonify({"message": "YouTube Music not configured!"}), 400
         
-    threading.Thread(target=perform_sync_all).start()
-    return jsonify({"success": True, "message": "Batch Sync Started"})
+    job_id = get_job_queue().submit("sync_all")
+    return jsonify({"success": True, "message": "Batch Sync Queued", "job_id": job_id})
 
 if __name__ == '__main__':
     # Ensure data dirs exist
     os.makedirs("data/automation", exist_ok=True)
     
+    # Imported as `app` (not __main__) so the routes and the worker share one Scraper and job queue
+    import app as web
+    import worker
+
+    # Single-process deployment: run the scheduler and jobs here too, or stand
+    # by while a separate worker.py holds the leader lock
+    worker.start_embedded()
+
     logging.info("Starting Flask server on port 1785...")
-    app.run(host='0.0.0.0', port=1785)
+    web.app.run(host='0.0.0.0', port=1785)
@@ -0,0 +1,198 @@
+"""
+Offline end-to-end benchmark: backfill, scheduled cycles and YouTube sync
+against a local Spinitron stand-in and a fake YTMusic.
+
+    python benchmarks/e2e_bench.py [--playlists 200] [--latency 0.02] ...
+    python benchmarks/e2e_bench.py --compare benchmarks/results/<earlier>.json
+
+Everything runs in a throwaway working directory, so the real data/ folder
+and config.yaml are never touched. Results are printed and saved as JSON
+(benchmarks/results/ by default) so runs can be compared.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import yaml
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+from stubs import SpinitronStub, FakeYTMusic  # noqa: E402
+
+
+class Timer:
+    """Accumulates wall time of calls to a wrapped method."""
+    def __init__(self):
+        self.total = 0.0
+        self.calls = 0
+
+    def wrap(self, func):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+                self.calls += 1
+        return timed
+
+    def take(self):
+        result = {"seconds": round(self.total, 4), "calls": self.calls}
+        self.total = 0.0
+        self.calls = 0
+        return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True).strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    stub = SpinitronStub(playlists=args.playlists, per_page=args.per_page, spins=args.spins, latency=args.latency).start()
+    workdir = tempfile.mkdtemp(prefix="wuog-bench-")
+    os.chdir(workdir)
+
+    config = {
+        "polling_interval_minutes": 60,
+        "user_agent": "WUOG-Bench/1.0",
+        "database_path": "data/wuog_data.db",
+        "fetch_concurrency": args.fetch_concurrency,
+        "politeness": {"requests_per_second": args.politeness_rps, "burst": 4},
+        "targets": [{
+            "name": "Automation",
+            "url": stub.dj_url,
+            "export_folder": "data/automation",
+            "consolidation": "seasonal",
+            "time_filter": {"start": 7, "end": 22},
+        }],
+        "youtube": {
+            "search_concurrency": args.search_concurrency,
+            "search_rate_per_second": args.search_rps,
+            "search_burst": 5,
+        },
+    }
+    with open("config.yaml", "w") as f:
+        yaml.safe_dump(config, f)
+
+    # app builds its Scraper from ./config.yaml on first use
+    import app
+    scraper = app.get_scraper()
+    target = scraper.config["targets"][0]
+
+    db_timer, export_timer = Timer(), Timer()
+    scraper.db.save_playlist_with_songs = db_timer.wrap(scraper.db.save_playlist_with_songs)
+    scraper.export_data = export_timer.wrap(scraper.export_data)
+
+    results = {}
+
+    def stage(name, func):
+        stub.reset_counts()
+        start = time.perf_counter()
+        func()
+        results[name] = {
+            "wall_seconds": round(time.perf_counter() - start, 4),
+            "requests": dict(stub.counts),
+            "db_write": db_timer.take(),
+            "export": export_timer.take(),
+        }
+
+    pages = -(-args.playlists // args.per_page) + 1
+    stage("backfill", lambda: scraper.process_target(target, max_pages=pages, gap_repair=True))
+    stage("cycle_unchanged", scraper.run_cycle)
+    stub.publish(args.new_playlists)
+    stage("cycle_new_plays", scraper.run_cycle)
+
+    # YouTube sync of the largest exported CSV: cold, then again with nothing new
+    csv_files = sorted(os.listdir("data/automation"), key=lambda f: os.path.getsize(os.path.join("data/automation", f)))
+    filename = [f for f in csv_files if f.endswith(".csv")][-1]
+    with open(os.path.join("data/automation", filename), encoding="utf-8") as f:
+        rows = sum(1 for _ in f) - 1
+
+    yt = FakeYTMusic(search_latency=args.search_latency, rate_limit=args.yt_rate_limit)
+    for name in ("sync_cold", "sync_warm"):
+        yt.counts = {k: 0 for k in yt.counts}
+        start = time.perf_counter()
+        ok, error = app._process_sync(yt, filename, lambda message, progress: None)
+        elapsed = time.perf_counter() - start
+        results[name] = {
+            "ok": ok,
+            "error": error,
+            "rows": rows,
+            "wall_seconds": round(elapsed, 4),
+            "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+            "youtube_calls": dict(yt.counts),
+        }
+
+    stub.stop()
+    return results
+
+
+def print_results(results, baseline=None):
+    for name, data in results.items():
+        line = f"{name:<16} {data['wall_seconds']:>8.3f}s"
+        if baseline and name in baseline:
+            before = baseline[name]["wall_seconds"]
+            if before:
+                line += f"  ({(data['wall_seconds'] - before) / before:+.0%} vs baseline)"
+        if "requests" in data:
+            line += f"  requests={data['requests']}  db_write={data['db_write']['seconds']}s  export={data['export']['seconds']}s"
+        else:
+            line += f"  rows/s={data['rows_per_sec']}  yt={data['youtube_calls']}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmark")
+    parser.add_argument("--playlists", type=int, default=200, help="Playlists available on the stub DJ page")
+    parser.add_argument("--per-page", type=int, default=20)
+    parser.add_argument("--spins", type=int, default=20, help="Songs per playlist")
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub Spinitron response latency (s)")
+    parser.add_argument("--new-playlists", type=int, default=5, help="Shows published before the second cycle")
+    parser.add_argument("--fetch-concurrency", type=int, default=4)
+    parser.add_argument("--politeness-rps", type=float, default=50)
+    parser.add_argument("--search-latency", type=float, default=0.02, help="Fake YTMusic search latency (s)")
+    parser.add_argument("--yt-rate-limit", type=int, default=None, help="Fake YTMusic searches/sec before 429s")
+    parser.add_argument("--search-concurrency", type=int, default=4)
+    parser.add_argument("--search-rps", type=float, default=50)
+    parser.add_argument("--out", help="Where to write results JSON")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        with open(os.path.abspath(args.compare)) as f:
+            baseline = json.load(f)["results"]
+
+    out = os.path.abspath(args.out) if args.out else os.path.join(
+        BENCH_DIR, "results", f"e2e-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    )
+
+    results = run(args)
+    print_results(results, baseline)
+
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump({
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "params": vars(args),
+            "results": results,
+        }, f, indent=2)
+    print(f"Results written to {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Micro-benchmark for the Spinitron HTML extraction path.
+
+Parses the saved fixture pages with each available backend and reports
+pages/sec plus the peak memory allocated (tracemalloc) while parsing one page:
+
+    python benchmarks/parser_bench.py [--seconds 2] [--json results.json]
+
+"legacy" is the original extraction (whole-page html.parser tree and two
+find() calls per field); the other rows use scraper.extract_playlists /
+extract_spins with the named parser.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from scraper import extract_playlists, extract_spins  # noqa: E402
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+BASE_URL = "https://spinitron.com/WUOG/dj/132321/Automation"
+
+
+def legacy_playlists(html, base_url):
+    soup = BeautifulSoup(html, 'html.parser')
+    playlists = []
+    for item in soup.find_all('div', {'class': 'list-item'}):
+        link_tag = item.find('a', {'class': 'link row'})
+        if not link_tag:
+            continue
+        dt_div = item.find('div', {'class': 'datetime playlist'})
+        date_str = time_str = ""
+        if dt_div:
+            try:
+                month = dt_div.find('span', {'class': 'month'}).text.strip()
+                day = dt_div.find('span', {'class': 'day'}).text.strip()
+                year = dt_div.find('span', {'class': 'year'}).text.strip()
+                date_str = f"{month} {day} {year}"
+                time_str = dt_div.find('span', {'class': 'time'}).text.strip()
+            except AttributeError:
+                pass
+        playlists.append({
+            'url': urljoin(base_url, link_tag['href']),
+            'show_title': item.find('h3', {'class': 'show-title'}).text.strip() if item.find('h3', {'class': 'show-title'}) else "N/A",
+            'dj_name': item.find('p', {'class': 'dj-name'}).text.strip() if item.find('p', {'class': 'dj-name'}) else "N/A",
+            'date_str': date_str,
+            'time_str': time_str
+        })
+    return playlists
+
+
+def legacy_spins(html):
+    soup = BeautifulSoup(html, 'html.parser')
+    songs = []
+    for row in soup.find_all('tr', {'class': 'spin-item'}):
+        songs.append({
+            'artist': row.find('span', {'class': 'artist'}).text.strip() if row.find('span', {'class': 'artist'}) else "Unknown",
+            'song': row.find('span', {'class': 'song'}).text.strip() if row.find('span', {'class': 'song'}) else "Unknown",
+            'album': row.find('span', {'class': 'release'}).text.strip() if row.find('span', {'class': 'release'}) else "N/A"
+        })
+    return songs
+
+
+def available_backends():
+    backends = {
+        "legacy": (legacy_playlists, legacy_spins),
+        "html.parser": (lambda h, u: extract_playlists(h, u, 'html.parser'), lambda h: extract_spins(h, 'html.parser')),
+    }
+    try:
+        import lxml  # noqa: F401
+        backends["lxml"] = (lambda h, u: extract_playlists(h, u, 'lxml'), lambda h: extract_spins(h, 'lxml'))
+    except ImportError:
+        pass
+    return backends
+
+
+def measure(func, seconds):
+    # Throughput
+    pages = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        func()
+        pages += 1
+    elapsed = time.perf_counter() - start
+
+    # Allocations for a single page: peak traced memory while parsing it
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "pages_per_sec": round(pages / elapsed, 1),
+        "peak_alloc_kib": round(peak / 1024, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Spinitron HTML extraction backends")
+    parser.add_argument("--seconds", type=float, default=2.0, help="Time budget per backend and page type")
+    parser.add_argument("--json", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    with open(os.path.join(FIXTURES, "dj_list_page.html"), "rb") as f:
+        list_html = f.read()
+    with open(os.path.join(FIXTURES, "playlist_page.html"), "rb") as f:
+        playlist_html = f.read()
+
+    backends = available_backends()
+    expected = (legacy_playlists(list_html, BASE_URL), legacy_spins(playlist_html))
+
+    results = {}
+    print(f"{'backend':<12} {'page':<9} {'pages/sec':>10} {'peak alloc KiB':>15}")
+    for name, (playlists_fn, spins_fn) in backends.items():
+        # Every backend must extract exactly what the legacy path did
+        if name != "legacy":
+            got = (playlists_fn(list_html, BASE_URL), spins_fn(playlist_html))
+            if got != expected:
+                print(f"{name}: output differs from legacy extraction", file=sys.stderr)
+                sys.exit(1)
+
+        results[name] = {
+            "list": measure(lambda: playlists_fn(list_html, BASE_URL), args.seconds),
+            "playlist": measure(lambda: spins_fn(playlist_html), args.seconds),
+        }
+        for page, row in results[name].items():
+            print(f"{name:<12} {page:<9} {row['pages_per_sec']:>10} {row['peak_alloc_kib']:>15}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
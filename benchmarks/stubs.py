@@ -0,0 +1,188 @@
+"""
+Offline stand-ins used by the end-to-end benchmark: a local HTTP server that
+serves synthetic Spinitron DJ-list and playlist pages, and a fake YTMusic.
+"""
+import hashlib
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ARTISTS = ['Big Thief', 'Alvvays', 'Japanese Breakfast', 'Wednesday', 'MJ Lenderman', 'Waxahatchee',
+           'Snail Mail', 'Beach House', 'Sigur Rós', 'Björk', 'Khruangbin', 'Men I Trust', 'Slowdive',
+           'Mitski', 'Sufjan Stevens', 'Alex G', 'Faye Webster', 'Indigo De Souza', 'Hovvdy', 'Duster']
+MONTHS = ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec']
+
+
+def _ordinal(day):
+    return f"{day}{'th' if 11 <= day <= 13 else {1: 'st', 2: 'nd', 3: 'rd'}.get(day % 10, 'th')}"
+
+
+class SpinitronStub:
+    """
+    Serves /WUOG/dj/1/Automation?page=N (newest playlists first) and
+    /WUOG/pl/<id>/Automation. Playlist N airs 3*N hours after Jan 1st 2026, so
+    pages cover realistic dates and Light/Dark hours. ETags are honoured so
+    the scraper's conditional GETs see 304s for unchanged pages.
+    """
+    def __init__(self, playlists=200, per_page=20, spins=20, latency=0.0, port=0):
+        self.total = playlists
+        self.per_page = per_page
+        self.spins = spins
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.counts = {"list": 0, "playlist": 0, "not_modified": 0}
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stub._handle(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def dj_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}/WUOG/dj/1/Automation"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def publish(self, count):
+        """Simulates `count` new shows airing."""
+        with self.lock:
+            self.total += count
+
+    def reset_counts(self):
+        with self.lock:
+            self.counts = {k: 0 for k in self.counts}
+
+    def _count(self, kind):
+        with self.lock:
+            self.counts[kind] += 1
+
+    def _playlist_meta(self, pid):
+        hours = pid * 3
+        day_of_year, hour = divmod(hours, 24)
+        month, day = divmod(day_of_year % 336, 28)
+        year = 2026 + day_of_year // 336
+        return MONTHS[month], _ordinal(day + 1), year, hour
+
+    def _list_page(self, page):
+        with self.lock:
+            total = self.total
+        newest = total - (page - 1) * self.per_page
+        items = []
+        for pid in range(newest, max(newest - self.per_page, 0), -1):
+            month, day, year, hour = self._playlist_meta(pid)
+            items.append(
+                f'<div class="list-item"><a class="link row" href="/WUOG/pl/{pid}/Automation">'
+                f'<div class="datetime playlist"><span class="month">{month}</span> <span class="day">{day}</span> '
+                f'<span class="year">{year}</span> <span class="time">{(hour % 12) or 12}:00 {"AM" if hour < 12 else "PM"}</span></div>'
+                f'<h3 class="show-title">Show {pid % 9}</h3><p class="dj-name">DJ {pid % 5}</p></a></div>'
+            )
+        return f"<html><head><title>Automation</title></head><body><div class=\"list-view\">{''.join(items)}</div></body></html>"
+
+    def _playlist_page(self, pid):
+        rows = []
+        for j in range(self.spins):
+            artist = ARTISTS[(pid * 7 + j) % len(ARTISTS)]
+            rows.append(
+                f'<tr class="spin-item"><td class="spin-text"><span class="artist">{artist}</span> '
+                f'<span class="song">Track {(pid * 13 + j) % 97}</span> <span class="release">Album {j % 7}</span></td></tr>'
+            )
+        return f"<html><body><table class=\"spins\"><tbody>{''.join(rows)}</tbody></table></body></html>"
+
+    def _handle(self, request):
+        if self.latency:
+            time.sleep(self.latency)
+
+        playlist_match = re.search(r'/pl/(\d+)', request.path)
+        if playlist_match:
+            body = self._playlist_page(int(playlist_match.group(1)))
+        else:
+            page_match = re.search(r'page=(\d+)', request.path)
+            body = self._list_page(int(page_match.group(1)) if page_match else 1)
+
+        payload = body.encode("utf-8")
+        etag = '"%s"' % hashlib.md5(payload).hexdigest()
+        if request.headers.get("If-None-Match") == etag:
+            self._count("not_modified")
+            request.send_response(304)
+            request.send_header("ETag", etag)
+            request.end_headers()
+            return
+        self._count("playlist" if playlist_match else "list")
+
+        request.send_response(200)
+        request.send_header("Content-Type", "text/html; charset=utf-8")
+        request.send_header("Content-Length", str(len(payload)))
+        request.send_header("ETag", etag)
+        request.end_headers()
+        request.wfile.write(payload)
+
+
+class FakeYTMusic:
+    """
+    Implements the slice of ytmusicapi.YTMusic used by the sync code. Searches
+    take `search_latency` seconds; more than `rate_limit` searches in any
+    one-second window raise the same error ytmusicapi raises on HTTP 429.
+    """
+    def __init__(self, search_latency=0.05, rate_limit=None, miss_ratio=0.1):
+        self.search_latency = search_latency
+        self.rate_limit = rate_limit
+        self.miss_ratio = miss_ratio
+        self.lock = threading.Lock()
+        self.window = []
+        self.playlists = {}
+        self.counts = {"search": 0, "throttled": 0, "add_calls": 0, "added": 0}
+
+    def _throttle(self):
+        if not self.rate_limit:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.window = [t for t in self.window if now - t < 1]
+            if len(self.window) >= self.rate_limit:
+                self.counts["throttled"] += 1
+                raise Exception("Server returned HTTP 429: Too Many Requests.\n")
+            self.window.append(now)
+
+    def search(self, query, filter=None, **kwargs):
+        self._throttle()
+        with self.lock:
+            self.counts["search"] += 1
+        time.sleep(self.search_latency)
+        digest = int(hashlib.md5(query.encode("utf-8")).hexdigest(), 16)
+        if (digest % 1000) / 1000 < self.miss_ratio:
+            return []
+        return [{"videoId": f"v{digest % 10 ** 11:011d}", "title": query}]
+
+    def get_library_playlists(self, limit=25):
+        items = [{"title": title, "playlistId": pid} for pid, (title, _) in self.playlists.items()]
+        return items if limit is None else items[:limit]
+
+    def create_playlist(self, title, description="", **kwargs):
+        pid = f"PL{len(self.playlists):04d}"
+        self.playlists[pid] = (title, [])
+        return pid
+
+    def get_playlist(self, playlistId, limit=100, **kwargs):
+        _, tracks = self.playlists[playlistId]
+        return {"id": playlistId, "tracks": [{"videoId": v} for v in tracks]}
+
+    def add_playlist_items(self, playlistId, videoIds=None, duplicates=False, **kwargs):
+        with self.lock:
+            self.counts["add_calls"] += 1
+            self.counts["added"] += len(videoIds or [])
+        time.sleep(self.search_latency)
+        self.playlists[playlistId][1].extend(videoIds or [])
+        return {"status": "STATUS_SUCCEEDED"}
@@ -0,0 +1,200 @@
+"""
+Background job queue persisted in the `jobs` table. A fixed pool of worker
+threads claims queued jobs; a job's checkpoint is saved as it goes, so jobs
+interrupted by a restart are re-queued and resume where they stopped.
+
+Only the worker process start()s the queue; other processes (the web app)
+use an unstarted queue to submit and cancel jobs through the database.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+import metrics
+
+
+class JobCancelled(BaseException):
+    """
+    Raised from a job's progress reports once cancellation was requested.
+    Derives from BaseException so the broad `except Exception` handlers in
+    the scrape and sync code let it through to the worker.
+    """
+
+
+class Job:
+    """Handle passed to job handlers: params, checkpoint and progress reporting."""
+    # Progress is written at most this often; state changes are written at once
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, queue, record):
+        self.queue = queue
+        self.id = record['id']
+        self.kind = record['kind']
+        self.params = record['params']
+        self.checkpoint = record['checkpoint']
+        self.cancel_event = threading.Event()
+        if record['cancel_requested']:
+            self.cancel_event.set()
+        self.progress = record['progress']
+        self.message = record['message']
+        self._last_flush = 0.0
+        self._last_cancel_check = 0.0
+
+    def raise_if_cancelled(self):
+        if self.cancel_requested():
+            raise JobCancelled()
+
+    def cancel_requested(self):
+        """
+        True once cancellation was requested. Cancels from another process only
+        reach us through the database, which is re-read at most every FLUSH_INTERVAL.
+        """
+        if not self.cancel_event.is_set():
+            now = time.monotonic()
+            if now - self._last_cancel_check >= self.FLUSH_INTERVAL:
+                self._last_cancel_check = now
+                if self.queue.db.get_job(self.id)['cancel_requested']:
+                    self.cancel_event.set()
+        return self.cancel_event.is_set()
+
+    def set_status(self, message, progress=None):
+        """Reports progress (0-100). Doubles as a cancellation point."""
+        self.raise_if_cancelled()
+        self.report(message, progress)
+
+    def report(self, message, progress=None):
+        """set_status without the cancellation check, for callers that stop on their own."""
+        self.message = message
+        if progress is not None:
+            self.progress = int(progress)
+        now = time.monotonic()
+        if now - self._last_flush >= self.FLUSH_INTERVAL:
+            self._last_flush = now
+            self.queue.db.update_job(self.id, progress=self.progress, message=self.message)
+            self.queue.notify_change()
+            self.cancel_requested()
+
+    def save_checkpoint(self, **state):
+        """Merges state into the checkpoint and persists it, with the latest progress."""
+        self.checkpoint.update(state)
+        self.queue.db.update_job(self.id, checkpoint=self.checkpoint, progress=self.progress, message=self.message)
+        self.queue.notify_change()
+
+
+class JobQueue:
+    """
+    handlers: {kind: (lane, function(job))}. Jobs sharing a lane run one at a
+    time in submission order, so two YouTube syncs never overlap.
+    """
+    def __init__(self, db, handlers, workers=2, poll_seconds=5):
+        self.db = db
+        self.handlers = handlers
+        self.workers = max(1, workers)
+        self.poll_seconds = poll_seconds
+        self.running = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Condition(self.lock)
+        self.started = False
+        # Bumped whenever a job row changes; event streams wait on it
+        self.version = 0
+        self.changed = threading.Condition()
+
+    def start(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        resumed = self.db.requeue_interrupted_jobs()
+        if resumed:
+            logging.info(f"Re-queued {resumed} interrupted job(s)")
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True).start()
+
+    def notify_change(self):
+        with self.changed:
+            self.version += 1
+            self.changed.notify_all()
+
+    def wait_for_change(self, version, timeout):
+        """Blocks until the job state moves past version (or timeout); returns the current version."""
+        if self.started:
+            with self.changed:
+                self.changed.wait_for(lambda: self.version != version, timeout)
+                return self.version
+
+        # Jobs run in the worker process: watch for its commits once a second
+        deadline = time.monotonic() + timeout
+        data_version = self.db.data_version()
+        with self.changed:
+            while self.version == version:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self.changed.wait_for(lambda: self.version != version, min(1.0, remaining)):
+                    break
+                if self.db.data_version() != data_version:
+                    self.version += 1
+            return self.version
+
+    def submit(self, kind, params=None):
+        lane, _ = self.handlers[kind]
+        job_id = self.db.create_job(kind, lane, params or {})
+        logging.info(f"Queued job {job_id}: {kind} {params or ''}")
+        self.notify_change()
+        with self.wakeup:
+            self.wakeup.notify_all()
+        return job_id
+
+    def cancel(self, job_id):
+        """Returns False if the job is unknown or already finished."""
+        state = self.db.request_job_cancel(job_id)
+        if state is None:
+            return False
+        self.notify_change()
+        with self.lock:
+            job = self.running.get(job_id)
+        if job:
+            job.cancel_event.set()
+        return True
+
+    def _worker(self):
+        while True:
+            try:
+                record = self.db.claim_job()
+            except Exception as e:
+                logging.error(f"Could not claim a job: {e}")
+                record = None
+            if record is None:
+                with self.wakeup:
+                    self.wakeup.wait(self.poll_seconds)
+                continue
+            self.notify_change()
+            self._run(Job(self, record))
+            # A lane just freed up; let idle workers look again
+            with self.wakeup:
+                self.wakeup.notify_all()
+
+    def _run(self, job):
+        _, handler = self.handlers[job.kind]
+        with self.lock:
+            self.running[job.id] = job
+        # A cancel that landed between claiming and registering the job
+        if self.db.get_job(job.id)['cancel_requested']:
+            job.cancel_event.set()
+        logging.info(f"Starting job {job.id}: {job.kind}{' (resuming)' if job.checkpoint else ''}")
+        try:
+            message = handler(job) or "Complete!"
+            status, progress = 'complete', 100
+        except JobCancelled:
+            status, message, progress = 'cancelled', "Cancelled", job.progress
+        except Exception as e:
+            logging.error(f"Job {job.id} ({job.kind}) failed: {e}")
+            metrics.record_error('job', e)
+            status, message, progress = 'error', str(e), job.progress
+        finally:
+            with self.lock:
+                self.running.pop(job.id, None)
+        self.db.update_job(job.id, status=status, message=message, progress=progress, finished_at=datetime.now())
+        self.notify_change()
+        logging.info(f"Job {job.id} {status}: {message}")
@@ -0,0 +1,114 @@
+"""
+Minimal Prometheus-style instrumentation: labelled counters and histograms
+kept in process memory and rendered in the text exposition format at /metrics.
+Recording is a lock plus a bisect, cheap enough to leave on everywhere.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}  # label key -> [bucket counts..., sum, count]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for key, series in sorted(self.series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series[-1]}")
+        return lines
+
+
+SPINITRON_FETCH_SECONDS = Histogram("wuog_spinitron_fetch_seconds", "Spinitron HTTP fetch latency by page kind")
+SPINITRON_FETCH_BYTES = Counter("wuog_spinitron_fetch_bytes_total", "Bytes downloaded from Spinitron by page kind")
+SPINITRON_RESPONSES = Counter("wuog_spinitron_responses_total", "Spinitron responses by page kind and HTTP status")
+PARSE_SECONDS = Histogram("wuog_parse_seconds", "HTML extraction time per page", (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+DB_TRANSACTION_SECONDS = Histogram("wuog_db_transaction_seconds", "SQLite write transaction time (including lock wait)")
+EXPORT_BUCKET_SECONDS = Histogram("wuog_export_bucket_seconds", "Time to query and write one export CSV")
+YOUTUBE_SEARCH_SECONDS = Histogram("wuog_youtube_search_seconds", "YouTube Music search latency (network calls only)")
+SEARCH_CACHE_LOOKUPS = Counter("wuog_search_cache_lookups_total", "Search cache lookups by result")
+ERRORS = Counter("wuog_errors_total", "Errors by stage and exception type")
+SCHEDULER_LAG_SECONDS = Histogram("wuog_scheduler_lag_seconds", "Delay between a job's scheduled and actual start", (0.5, 1, 2, 5, 10, 30, 60, 300, 900, 3600))
+
+REGISTRY = [
+    SPINITRON_FETCH_SECONDS, SPINITRON_FETCH_BYTES, SPINITRON_RESPONSES, PARSE_SECONDS,
+    DB_TRANSACTION_SECONDS, EXPORT_BUCKET_SECONDS, YOUTUBE_SEARCH_SECONDS, SEARCH_CACHE_LOOKUPS,
+    ERRORS, SCHEDULER_LAG_SECONDS,
+]
+
+
+def record_error(stage, exc):
+    ERRORS.inc(stage=stage, type=type(exc).__name__)
+
+
+def render():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,152 @@
+"""
+Adaptive per-target polling. Each target's show cadence is learned from the
+play_datetime of its recent playlists: a target is polled shortly after a show
+is expected to end, retried with backoff when that poll finds nothing new, and
+otherwise left alone up to max_interval_minutes. Due targets run concurrently.
+"""
+import logging
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import schedule
+
+import metrics
+
+
+class AdaptivePoller:
+    # Backoff doubles per empty poll up to this many times; max_interval caps it anyway
+    MAX_BACKOFF_DOUBLINGS = 8
+
+    def __init__(self, scraper):
+        self.scraper = scraper
+        self.targets = scraper.config['targets']
+        cfg = scraper.config.get('polling', {})
+        self.min_interval = timedelta(minutes=cfg.get('min_interval_minutes', 5))
+        self.max_interval = timedelta(minutes=cfg.get('max_interval_minutes', 360))
+        self.grace = timedelta(minutes=cfg.get('grace_minutes', 3))
+        self.max_show = timedelta(hours=cfg.get('max_show_hours', 2))
+        self.history = cfg.get('history_playlists', 200)
+        # Spinitron times are station-local; compare them against the station's clock
+        self.timezone = ZoneInfo(cfg['timezone']) if cfg.get('timezone') else None
+        # Used until a target has enough history to predict from
+        self.fallback = timedelta(minutes=scraper.config.get('polling_interval_minutes', 60))
+
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=max(1, len(self.targets)), thread_name_prefix="poll")
+        now = self.now()
+        self.state = {t['name']: {"next_due": now, "misses": 0, "running": False} for t in self.targets}
+
+    def now(self):
+        if self.timezone:
+            return datetime.now(self.timezone).replace(tzinfo=None)
+        return datetime.now()
+
+    def tick(self):
+        """Starts every due target that is not already being polled. Never blocks."""
+        now = self.now()
+        for target in self.targets:
+            with self.lock:
+                state = self.state[target['name']]
+                if state['running'] or now < state['next_due']:
+                    continue
+                state['running'] = True
+            self.pool.submit(self._poll, target).add_done_callback(self._log_failure)
+
+    def _log_failure(self, future):
+        error = future.exception()
+        if error:
+            logging.error(f"Poller thread failed: {error!r}")
+            metrics.record_error('poll', error)
+
+    def _poll(self, target):
+        name = target['name']
+        found = 0
+        try:
+            found = self.scraper.poll_target(target)
+        except Exception as e:
+            logging.error(f"Polling {name} failed: {e}")
+            metrics.record_error('poll', e)
+        finally:
+            now = self.now()
+            with self.lock:
+                state = self.state[name]
+                state['misses'] = 0 if found else state['misses'] + 1
+                misses = state['misses']
+            # Whatever happens here, the target must become pollable again
+            next_due = now + self.fallback
+            try:
+                next_due = self.next_poll(name, now, misses)
+            except Exception as e:
+                logging.error(f"Scheduling the next poll of {name} failed: {e}")
+                metrics.record_error('poll', e)
+            finally:
+                with self.lock:
+                    state['next_due'] = next_due
+                    state['running'] = False
+            logging.info(f"Polled {name}: {found} new playlist(s); next poll at {next_due:%Y-%m-%d %H:%M}")
+        self.scraper.db.optimize()
+
+    def next_poll(self, name, now, misses):
+        predicted = self.predict_next_end(name, now)
+        # Capped before multiplying: timedelta overflows after ~30 doublings
+        doublings = min(misses, self.MAX_BACKOFF_DOUBLINGS)
+        if misses and predicted:
+            # A show was due but has not shown up yet: retry soon, backing off
+            due = min(predicted, now + min(self.max_interval, self.min_interval * 2 ** (doublings - 1)))
+        elif predicted:
+            due = predicted
+        else:
+            due = now + min(self.max_interval, self.fallback * 2 ** doublings)
+        return min(max(due, now + self.min_interval), now + self.max_interval)
+
+    def predict_next_end(self, name, now):
+        """
+        When the next show should have finished (plus grace), or None without
+        enough history. Candidates are the periodic continuation of the newest
+        playlists and the next occurrence of every weekly slot seen before.
+        """
+        starts = self.scraper.db.recent_play_times(name, self.history)
+        gaps = [(b - a) for a, b in zip(starts, starts[1:]) if b > a]
+        if len(gaps) < 2:
+            return None
+        period = statistics.median(gaps)
+        duration = min(period, self.max_show)
+        # Shows that started up to one duration ago may still be on air
+        earliest_start = now - duration - self.grace
+
+        candidates = []
+        start = starts[-1]
+        while start < earliest_start:
+            start += period
+        candidates.append(start)
+
+        week = timedelta(days=7)
+        for slot in {(s.weekday(), s.hour, s.minute) for s in starts}:
+            weekday, hour, minute = slot
+            start = earliest_start.replace(hour=hour, minute=minute, second=0, microsecond=0)
+            start += timedelta(days=(weekday - start.weekday()) % 7)
+            if start < earliest_start:
+                start += week
+            candidates.append(start)
+
+        ends = [start + duration + self.grace for start in candidates]
+        ends = [end for end in ends if end > now]
+        return min(ends) if ends else None
+
+
+def schedule_polling(scraper):
+    """
+    Registers target polling with `schedule`: adaptive per-target polling when
+    polling.adaptive is set, otherwise a fixed run_cycle every
+    polling_interval_minutes. Returns a description for the startup log.
+    """
+    interval = scraper.config.get('polling_interval_minutes', 60)
+    if scraper.config.get('polling', {}).get('adaptive', False):
+        poller = AdaptivePoller(scraper)
+        schedule.every(30).seconds.do(poller.tick)
+        return "Polling each target adaptively from its show cadence"
+    schedule.every(interval).minutes.do(scraper.run_cycle)
+    return f"Polling every {interval} minutes"
@@ -1,16 +1,31 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import re
-from bs4 import BeautifulSoup
+import unicodedata
+from bs4 import BeautifulSoup, SoupStrainer
 import csv
+import gzip
+import hashlib
+import json
 import os
+import tempfile
 import sqlite3
 import yaml
 import time
 import schedule
 import logging
 import argparse
-from datetime import datetime
-from urllib.parse import urljoin
+import calendar
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import datetime, timedelta
+from urllib.parse import urljoin, urlparse
+
+import metrics
+from poller import schedule_polling
+from throttle import TokenBucket
 
 # Configure logging
 logging.basicConfig(
@@ -22,109 +37,988 @@ logging.basicConfig(
     ]
 )
 
+# Prefer lxml's C parser when installed; html.parser is the pure-Python fallback
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = 'lxml'
+except ImportError:
+    HTML_PARSER = 'html.parser'
+
+# Only the regions we read are turned into a tree; the rest of the page is skipped
+PLAYLIST_ITEMS = SoupStrainer('div', class_='list-item')
+SPIN_ROWS = SoupStrainer('tr', class_='spin-item')
+
+def _index_by_class(element):
+    """
+    One pass over element's descendants: {(tag name, class): first matching tag}.
+    Both single classes and the full class string ("link row") are indexed.
+    """
+    index = {}
+    for tag in element.find_all(True):
+        classes = tag.get('class')
+        if not classes:
+            continue
+        for cls in classes:
+            index.setdefault((tag.name, cls), tag)
+        if len(classes) > 1:
+            index.setdefault((tag.name, ' '.join(classes)), tag)
+    return index
+
+def _text(index, name, cls, default=None):
+    tag = index.get((name, cls))
+    return tag.text.strip() if tag is not None else default
+
+def extract_playlists(html, base_url, parser=None):
+    """
+    Parses a Spinitron DJ/show list page (div.list-item entries) into
+    [{'url', 'show_title', 'dj_name', 'date_str', 'time_str'}], newest first.
+    """
+    soup = BeautifulSoup(html, parser or HTML_PARSER, parse_only=PLAYLIST_ITEMS)
+    playlists = []
+    for item in soup.find_all('div', class_='list-item'):
+        fields = _index_by_class(item)
+        link_tag = fields.get(('a', 'link row'))
+        if link_tag is None or not link_tag.get('href'):
+            continue
+        playlist_url = urljoin(base_url, link_tag['href'])
+
+        date_str = ""
+        time_str = ""
+        dt_div = fields.get(('div', 'datetime playlist'))
+        if dt_div is not None:
+            dt_fields = _index_by_class(dt_div)
+            month = _text(dt_fields, 'span', 'month')
+            day = _text(dt_fields, 'span', 'day')
+            year = _text(dt_fields, 'span', 'year')
+            time_part = _text(dt_fields, 'span', 'time')
+            if month is not None and day is not None and year is not None:
+                date_str = f"{month} {day} {year}"
+                time_str = time_part or ""
+            if None in (month, day, year, time_part):
+                logging.warning(f"Could not parse date/time for {playlist_url}")
+
+        playlists.append({
+            'url': playlist_url,
+            'show_title': _text(fields, 'h3', 'show-title', "N/A"),
+            'dj_name': _text(fields, 'p', 'dj-name', "N/A"),
+            'date_str': date_str,
+            'time_str': time_str
+        })
+    return playlists
+
+def extract_spins(html, parser=None):
+    """Parses a Spinitron playlist page (tr.spin-item rows) into [{'artist', 'song', 'album'}]."""
+    soup = BeautifulSoup(html, parser or HTML_PARSER, parse_only=SPIN_ROWS)
+    songs = []
+    for row in soup.find_all('tr', class_='spin-item'):
+        fields = _index_by_class(row)
+        songs.append({
+            'artist': _text(fields, 'span', 'artist', "Unknown"),
+            'song': _text(fields, 'span', 'song', "Unknown"),
+            'album': _text(fields, 'span', 'release', "N/A")
+        })
+    return songs
+
+# Bracketed or " - " suffixed title parts that name an edition rather than a different recording
+EDITION_TAGS = re.compile(
+    r"\b(?:feat|ft|featuring|remaster(?:ed)?|re-?master(?:ed)?|deluxe|expanded|anniversary|bonus track"
+    r"|single version|album version|radio edit|radio version|mono|stereo|explicit|clean version)\b"
+)
+BRACKETED = re.compile(r"\s*[\(\[]([^\)\]]*)[\)\]]")
+DASH_SUFFIX = re.compile(r"\s+-\s+(.*)$")
+FEATURING = re.compile(r"\s+(?:feat\.?|ft\.?|featuring)\s+.*$")
+NON_WORD = re.compile(r"[\W_]+")
+
+def _canonical_text(text):
+    text = unicodedata.normalize('NFKC', text or '').casefold()
+    text = BRACKETED.sub(lambda m: '' if EDITION_TAGS.search(m.group(1)) else m.group(0), text)
+    text = DASH_SUFFIX.sub(lambda m: '' if EDITION_TAGS.search(m.group(1)) else m.group(0), text)
+    text = FEATURING.sub('', text).replace('&', ' and ')
+    return ' '.join(NON_WORD.sub(' ', text).split())
+
+def canonical_track_key(artist, song):
+    """
+    Key used to recognise the same track across plays, exports, searches and syncs:
+    NFKC + casefold, featured artists and edition tags ("Remastered", "Radio Edit",
+    "Deluxe"...) removed, punctuation collapsed. Remixes and live takes stay distinct.
+    """
+    return f"{_canonical_text(artist)}|{_canonical_text(song)}"
+
+def parse_play_datetime(date_str, time_str):
+    """
+    "Jan 5th 2026", "2:30 PM" -> "2026-01-05T14:30:00". If only the date parses,
+    the date alone is returned; if the date doesn't parse, None.
+    """
+    try:
+        # Remove ordinal suffixes
+        clean_date = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_str or "")
+        day = datetime.strptime(clean_date, "%b %d %Y")
+    except ValueError:
+        return None
+    try:
+        t = datetime.strptime(time_str or "", "%I:%M %p")
+    except ValueError:
+        return day.date().isoformat()
+    return day.replace(hour=t.hour, minute=t.minute).isoformat()
+
+# Written by Scraper.write_manifest into every export folder
+MANIFEST_NAME = "manifest.json"
+# Full play snapshots, named by the newest songs.id they contain
+SNAPSHOT_PATTERN = re.compile(r'^plays-(\d+)\.ndjson\.gz$')
+
+class _HashingWriter:
+    """File-like wrapper that checksums text as csv.writer writes it."""
+    def __init__(self, f):
+        self.f = f
+        self.sha = hashlib.sha256()
+
+    def write(self, text):
+        self.sha.update(text.encode('utf-8'))
+        return self.f.write(text)
+
+    def hexdigest(self):
+        return self.sha.hexdigest()
+
+# The mode open(path, 'w') would give a new file; read once because os.umask can only be read by setting it
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+def _publish(tmp_path, path):
+    """Renames a finished temp file over path. NamedTemporaryFile creates files 0600, so widen it first."""
+    os.chmod(tmp_path, FILE_MODE)
+    os.replace(tmp_path, path)
+
 class Database:
+    """
+    SQLite access shared by the Flask, scheduler and backfill threads.
+    Each thread keeps its own connection (WAL mode, so readers never block the
+    writer) and every write runs in a single BEGIN IMMEDIATE transaction.
+    """
     def __init__(self, db_path):
         self.db_path = db_path
+        self._local = threading.local()
+        # Search cache hits waiting for flush_search_hits: {track_key: last used}, and how many
+        self._search_hits = {}
+        self._search_hit_count = 0
+        self._search_hits_lock = threading.Lock()
         self._init_db()
 
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: we issue BEGIN/COMMIT ourselves in _transaction()
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=30000')
+            conn.execute('PRAGMA cache_size=-16000')
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Yields a cursor inside BEGIN IMMEDIATE. Taking the write lock up front
+        means busy_timeout applies, instead of failing with "database is locked"
+        when a deferred transaction tries to upgrade.
+        """
+        conn = self._connect()
+        cursor = conn.cursor()
+        with metrics.DB_TRANSACTION_SECONDS.time():
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                yield cursor
+                cursor.execute('COMMIT')
+            except BaseException as e:
+                cursor.execute('ROLLBACK')
+                metrics.record_error('db', e)
+                raise
+
     def _init_db(self):
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Table for playlists
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS playlists (
-                url TEXT PRIMARY KEY,
-                target_name TEXT,
-                show_title TEXT,
-                dj_name TEXT,
-                date_str TEXT,
-                time_str TEXT,
-                timestamp DATETIME
-            )
-        ''')
+        with self._transaction() as cursor:
+            # Table for playlists
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS playlists (
+                    url TEXT PRIMARY KEY,
+                    target_name TEXT,
+                    show_title TEXT,
+                    dj_name TEXT,
+                    date_str TEXT,
+                    time_str TEXT,
+                    timestamp DATETIME
+                )
+            ''')
 
-        # Table for songs
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS songs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                playlist_url TEXT,
-                artist TEXT,
-                song TEXT,
-                album TEXT,
-                timestamp DATETIME,
-                UNIQUE(playlist_url, artist, song)
-            )
-        ''')
-        conn.commit()
-        conn.close()
+            # Table for songs
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS songs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    playlist_url TEXT,
+                    artist TEXT,
+                    song TEXT,
+                    album TEXT,
+                    timestamp DATETIME,
+                    track_key TEXT,
+                    UNIQUE(playlist_url, artist, song)
+                )
+            ''')
 
-    def playlist_exists(self, url):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        cursor.execute('SELECT 1 FROM playlists WHERE url = ?', (url,))
-        exists = cursor.fetchone() is not None
-        conn.close()
-        return exists
+            # Cache of YouTube Music search results (video_id NULL = no match)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    track_key TEXT PRIMARY KEY,
+                    video_id TEXT,
+                    created_at DATETIME,
+                    last_used DATETIME
+                )
+            ''')
 
-    def save_playlist(self, data):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
+            # HTTP validators for conditional GETs (ETag / Last-Modified per URL)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS http_validators (
+                    url TEXT PRIMARY KEY,
+                    etag TEXT,
+                    last_modified TEXT,
+                    updated_at DATETIME
+                )
+            ''')
+
+            # Per-target crawl high-water mark (newest playlist seen)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS crawl_state (
+                    target_name TEXT PRIMARY KEY,
+                    newest_playlist_url TEXT,
+                    updated_at DATETIME
+                )
+            ''')
+
+            # Persistent counters, shared by every process using the database
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS counters (
+                    name TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL DEFAULT 0
+                )
+            ''')
+
+            # Row count and checksum of each exported CSV
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS export_files (
+                    path TEXT PRIMARY KEY,
+                    target_name TEXT,
+                    bucket TEXT,
+                    row_count INTEGER,
+                    sha256 TEXT,
+                    updated_at DATETIME
+                )
+            ''')
+
+            # Ledger of tracks already pushed to each YouTube playlist
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS synced_tracks (
+                    playlist_id TEXT,
+                    track_key TEXT,
+                    video_id TEXT,
+                    synced_at DATETIME,
+                    PRIMARY KEY (playlist_id, track_key)
+                )
+            ''')
+
+            # YouTube Music playlist title -> playlistId, mirrored from the library
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS yt_playlists (
+                    title TEXT PRIMARY KEY,
+                    playlist_id TEXT,
+                    filename TEXT,
+                    updated_at DATETIME
+                )
+            ''')
+
+            # Background job queue (backfill / YouTube sync); params and checkpoint are JSON
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT,
+                    lane TEXT,
+                    params TEXT,
+                    status TEXT,
+                    progress INTEGER DEFAULT 0,
+                    message TEXT DEFAULT '',
+                    checkpoint TEXT,
+                    cancel_requested INTEGER DEFAULT 0,
+                    created_at DATETIME,
+                    started_at DATETIME,
+                    finished_at DATETIME
+                )
+            ''')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, lane)')
+
+            self._migrate(cursor)
+        self.optimize()
+
+    def optimize(self):
+        """Refreshes planner statistics where they are missing or stale (cheap when nothing changed)."""
         try:
+            self._connect().execute('PRAGMA optimize')
+        except sqlite3.Error as e:
+            logging.warning(f"PRAGMA optimize failed: {e}")
+
+    def _migrate(self, cursor):
+        """Adds columns/indexes introduced after the original schema, backfilling existing rows."""
+        playlist_columns = {row[1] for row in cursor.execute('PRAGMA table_info(playlists)')}
+        if 'play_datetime' not in playlist_columns:
+            logging.info("Migrating: adding playlists.play_datetime")
+            cursor.execute('ALTER TABLE playlists ADD COLUMN play_datetime TEXT')
+
+        # Backfill anything not yet parsed (rows with unparseable dates stay NULL)
+        pending = cursor.execute(
+            "SELECT url, date_str, time_str FROM playlists WHERE play_datetime IS NULL AND date_str != ''"
+        ).fetchall()
+        updates = [(parse_play_datetime(d, t), url) for url, d, t in pending]
+        updates = [u for u in updates if u[0] is not None]
+        if updates:
+            cursor.executemany('UPDATE playlists SET play_datetime = ? WHERE url = ?', updates)
+            logging.info(f"Backfilled play_datetime for {len(updates)} playlists")
+
+        song_columns = {row[1] for row in cursor.execute('PRAGMA table_info(songs)')}
+        if 'track_key' not in song_columns:
+            logging.info("Migrating: adding songs.track_key")
+            cursor.execute('ALTER TABLE songs ADD COLUMN track_key TEXT')
+            # Search cache and sync ledger were keyed with the old lower()-only key
+            for table, key_columns in (('search_cache', ('track_key',)), ('synced_tracks', ('playlist_id', 'track_key'))):
+                rows = cursor.execute(f'SELECT * FROM {table}').fetchall()
+                columns = [d[0] for d in cursor.description]
+                key_index = columns.index('track_key')
+                rekeyed = []
+                for row in rows:
+                    row = list(row)
+                    row[key_index] = canonical_track_key(*row[key_index].split('|', 1)) if '|' in row[key_index] else row[key_index]
+                    rekeyed.append(row)
+                cursor.execute(f'DELETE FROM {table}')
+                cursor.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    rekeyed
+                )
+
+        pending = cursor.execute('SELECT id, artist, song FROM songs WHERE track_key IS NULL').fetchall()
+        if pending:
+            cursor.executemany('UPDATE songs SET track_key = ? WHERE id = ?',
+                               [(canonical_track_key(artist, song), song_id) for song_id, artist, song in pending])
+            logging.info(f"Backfilled track_key for {len(pending)} songs")
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_songs_track_key ON songs(track_key)')
+
+        # Play-count rollups, maintained by _insert_songs; built from history on first run
+        has_rollups = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'rollup_plays'").fetchone()
+        has_track_rollup = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'rollup_track_month'").fetchone()
+        if not has_rollups:
             cursor.execute('''
-                INSERT OR IGNORE INTO playlists (url, target_name, show_title, dj_name, date_str, time_str, timestamp)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (data['url'], data['target_name'], data['show_title'], data['dj_name'], data['date_str'], data['time_str'], datetime.now()))
-            conn.commit()
-        except Exception as e:
-            logging.error(f"Error saving playlist: {e}")
-        finally:
-            conn.close()
+                CREATE TABLE rollup_plays (
+                    target_name TEXT,
+                    day TEXT,
+                    hour INTEGER,
+                    track_key TEXT,
+                    artist TEXT,
+                    song TEXT,
+                    plays INTEGER,
+                    PRIMARY KEY (target_name, day, hour, track_key)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE rollup_artist_month (
+                    target_name TEXT,
+                    month TEXT,
+                    artist_key TEXT,
+                    artist TEXT,
+                    plays INTEGER,
+                    PRIMARY KEY (target_name, month, artist_key)
+                )
+            ''')
+            cursor.execute('''
+                CREATE TABLE rollup_hour_month (
+                    target_name TEXT,
+                    month TEXT,
+                    hour INTEGER,
+                    plays INTEGER,
+                    PRIMARY KEY (target_name, month, hour)
+                )
+            ''')
+        if not has_track_rollup:
+            cursor.execute('''
+                CREATE TABLE rollup_track_month (
+                    target_name TEXT,
+                    month TEXT,
+                    track_key TEXT,
+                    artist TEXT,
+                    song TEXT,
+                    plays INTEGER,
+                    PRIMARY KEY (target_name, month, track_key)
+                )
+            ''')
+            if has_rollups:
+                # Added after the other rollups: derive it from the daily one instead of rescanning songs
+                cursor.execute('''
+                    INSERT INTO rollup_track_month (target_name, month, track_key, artist, song, plays)
+                    SELECT target_name, substr(day, 1, 7), track_key, MAX(artist), MAX(song), SUM(plays)
+                    FROM rollup_plays
+                    GROUP BY 1, 2, 3
+                ''')
+                logging.info("Built monthly track rollup")
+        if not has_rollups:
+            self._update_rollups(cursor, 0)
+            logging.info("Built play rollups")
 
-    def save_songs(self, playlist_url, songs):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        new_count = 0
+        # Full-text index over artist/song/album, mirroring songs by rowid
+        has_fts = cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'plays_fts'").fetchone()
+        if not has_fts:
+            try:
+                cursor.execute('''
+                    CREATE VIRTUAL TABLE plays_fts USING fts5(
+                        artist, song, album,
+                        content='songs', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2'
+                    )
+                ''')
+                cursor.execute("INSERT INTO plays_fts(plays_fts) VALUES ('rebuild')")
+                logging.info("Built full-text index plays_fts")
+                has_fts = True
+            except sqlite3.OperationalError as e:
+                logging.warning(f"SQLite FTS5 unavailable, play search falls back to LIKE: {e}")
+        self.fts_enabled = bool(has_fts)
+
+        # Range scans per target; songs(playlist_url) is already covered by the
+        # UNIQUE(playlist_url, artist, song) index.
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_playlists_target_datetime ON playlists(target_name, play_datetime)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_playlists_datetime ON playlists(play_datetime)')
+
+    def existing_playlists(self, urls):
+        """Returns the subset of urls already stored, in a single query."""
+        urls = list(urls)
+        if not urls:
+            return set()
+        placeholders = ",".join("?" * len(urls))
+        cursor = self._connect().execute(f'SELECT url FROM playlists WHERE url IN ({placeholders})', urls)
+        return {row[0] for row in cursor.fetchall()}
+
+    def get_watermark(self, target_name):
+        cursor = self._connect().execute('SELECT newest_playlist_url FROM crawl_state WHERE target_name = ?', (target_name,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, target_name, playlist_url):
         try:
-            for song in songs:
-                try:
-                    cursor.execute('''
-                        INSERT INTO songs (playlist_url, artist, song, album, timestamp)
-                        VALUES (?, ?, ?, ?, ?)
-                    ''', (playlist_url, song['artist'], song['song'], song['album'], datetime.now()))
-                    new_count += 1
-                except sqlite3.IntegrityError:
-                    pass # Duplicate song in this playlist, skip
-            conn.commit()
+            with self._transaction() as cursor:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO crawl_state (target_name, newest_playlist_url, updated_at)
+                    VALUES (?, ?, ?)
+                ''', (target_name, playlist_url, datetime.now()))
         except Exception as e:
-            logging.error(f"Error saving songs: {e}")
-        finally:
-            conn.close()
-        return new_count
+            logging.error(f"Error saving watermark: {e}")
 
-    def get_songs_for_consolidation(self, target_name, start_date=None, end_date=None):
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Build query
-        query = '''
-            SELECT s.artist, s.song, s.album, p.date_str, p.time_str
-            FROM songs s
-            JOIN playlists p ON s.playlist_url = p.url
-            WHERE p.target_name = ?
+    def _insert_playlist(self, cursor, data):
+        cursor.execute('''
+            INSERT OR IGNORE INTO playlists (url, target_name, show_title, dj_name, date_str, time_str, timestamp, play_datetime)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (data['url'], data['target_name'], data['show_title'], data['dj_name'], data['date_str'], data['time_str'], datetime.now(),
+              parse_play_datetime(data['date_str'], data['time_str'])))
+
+    def _insert_songs(self, cursor, playlist_url, songs):
+        """
+        Bulk insert; duplicates within a playlist are ignored. Returns the number inserted.
+        New rows (ids above the pre-insert maximum) are added to the full-text index.
+        """
+        now = datetime.now()
+        max_id = cursor.execute('SELECT COALESCE(MAX(id), 0) FROM songs').fetchone()[0]
+        cursor.executemany('''
+            INSERT OR IGNORE INTO songs (playlist_url, artist, song, album, timestamp, track_key)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [(playlist_url, song['artist'], song['song'], song['album'], now, canonical_track_key(song['artist'], song['song']))
+              for song in songs])
+        inserted = max(cursor.rowcount, 0)
+        if inserted:
+            if self.fts_enabled:
+                cursor.execute('''
+                    INSERT INTO plays_fts (rowid, artist, song, album)
+                    SELECT id, artist, song, album FROM songs WHERE id > ?
+                ''', (max_id,))
+            self._update_rollups(cursor, max_id)
+        return inserted
+
+    def _update_rollups(self, cursor, min_id):
+        """
+        Adds songs with id > min_id to the rollups (target x day x hour x track,
+        target x month x track, target x month x artist, target x month x hour).
+        Hour -1 means the play time is unknown. Runs inside the caller's transaction.
+        """
+        new_plays = '''
+            SELECT p.target_name, p.play_datetime, s.track_key, s.artist, s.song,
+                   CASE WHEN length(p.play_datetime) > 10 THEN CAST(substr(p.play_datetime, 12, 2) AS INTEGER) ELSE -1 END AS hour
+            FROM songs s JOIN playlists p ON p.url = s.playlist_url
+            WHERE s.id > ? AND p.play_datetime IS NOT NULL
         '''
+        cursor.execute(f'''
+            INSERT INTO rollup_plays (target_name, day, hour, track_key, artist, song, plays)
+            SELECT target_name, substr(play_datetime, 1, 10), hour, track_key, MAX(artist), MAX(song), COUNT(*)
+            FROM ({new_plays}) WHERE true
+            GROUP BY 1, 2, 3, 4
+            ON CONFLICT (target_name, day, hour, track_key) DO UPDATE SET plays = plays + excluded.plays
+        ''', (min_id,))
+        cursor.execute(f'''
+            INSERT INTO rollup_track_month (target_name, month, track_key, artist, song, plays)
+            SELECT target_name, substr(play_datetime, 1, 7), track_key, MAX(artist), MAX(song), COUNT(*)
+            FROM ({new_plays}) WHERE true
+            GROUP BY 1, 2, 3
+            ON CONFLICT (target_name, month, track_key) DO UPDATE SET plays = plays + excluded.plays
+        ''', (min_id,))
+        cursor.execute(f'''
+            INSERT INTO rollup_artist_month (target_name, month, artist_key, artist, plays)
+            SELECT target_name, substr(play_datetime, 1, 7), substr(track_key, 1, instr(track_key, '|') - 1), MAX(artist), COUNT(*)
+            FROM ({new_plays}) WHERE true
+            GROUP BY 1, 2, 3
+            ON CONFLICT (target_name, month, artist_key) DO UPDATE SET plays = plays + excluded.plays
+        ''', (min_id,))
+        cursor.execute(f'''
+            INSERT INTO rollup_hour_month (target_name, month, hour, plays)
+            SELECT target_name, substr(play_datetime, 1, 7), hour, COUNT(*)
+            FROM ({new_plays}) WHERE true
+            GROUP BY 1, 2, 3
+            ON CONFLICT (target_name, month, hour) DO UPDATE SET plays = plays + excluded.plays
+        ''', (min_id,))
+
+    def save_playlist_with_songs(self, data, songs):
+        """
+        Writes a playlist and its songs atomically. Returns the number of new
+        songs, or None if the write failed (nothing was saved).
+        """
+        try:
+            with self._transaction() as cursor:
+                self._insert_playlist(cursor, data)
+                return self._insert_songs(cursor, data['url'], songs)
+        except Exception as e:
+            logging.error(f"Error saving playlist {data['url']}: {e}")
+            return None
+
+    PLAY_SELECT = ("s.id, s.artist, s.song, s.album, p.play_datetime, p.date_str, p.time_str, "
+                   "p.show_title, p.dj_name, p.target_name, p.url")
+    PLAY_COLUMNS = ('id', 'artist', 'song', 'album', 'play_datetime', 'date_str', 'time_str',
+                    'show_title', 'dj_name', 'target', 'playlist_url')
+
+    def search_plays(self, target_name=None, start_date=None, end_date=None, dj=None, show=None,
+                     query=None, limit=50, after=None):
+        """
+        Plays newest first as dicts, filtered by target, play_datetime range (ISO,
+        end exclusive), DJ/show substring and a full-text query over artist/song/album.
+        after=(play_datetime, song_id) continues from the last row of a previous page.
+        Plays whose date could not be parsed are left out.
+        """
+        where = ["p.play_datetime IS NOT NULL"]
+        params = []
+        if target_name:
+            where.append("p.target_name = ?")
+            params.append(target_name)
+        if start_date:
+            where.append("p.play_datetime >= ?")
+            params.append(start_date)
+        if end_date:
+            where.append("p.play_datetime < ?")
+            params.append(end_date)
+        if dj:
+            where.append("p.dj_name LIKE ?")
+            params.append(f"%{dj}%")
+        if show:
+            where.append("p.show_title LIKE ?")
+            params.append(f"%{show}%")
+        # A query with no word characters filters nothing, with or without FTS
+        terms = re.findall(r'\w+', query or '')
+        if terms:
+            if self.fts_enabled:
+                # Every term must match, as a prefix; quoting keeps user input out of FTS syntax
+                where.append("s.id IN (SELECT rowid FROM plays_fts WHERE plays_fts MATCH ?)")
+                params.append(' '.join(f'"{term}"*' for term in terms))
+            else:
+                for term in terms:
+                    where.append("(s.artist LIKE ? OR s.song LIKE ? OR s.album LIKE ?)")
+                    params.extend([f"%{term}%"] * 3)
+        if after:
+            where.append("(p.play_datetime < ? OR (p.play_datetime = ? AND s.id < ?))")
+            params.extend([after[0], after[0], after[1]])
+
+        cursor = self._connect().execute(f'''
+            SELECT {self.PLAY_SELECT}
+            FROM playlists p
+            JOIN songs s ON s.playlist_url = p.url
+            WHERE {" AND ".join(where)}
+            ORDER BY p.play_datetime DESC, s.id DESC
+            LIMIT ?
+        ''', (*params, limit))
+        return [dict(zip(self.PLAY_COLUMNS, row)) for row in cursor.fetchall()]
+
+    def max_song_id(self):
+        """The newest songs.id; ids only grow, so it doubles as a change-feed cursor."""
+        return self._connect().execute('SELECT COALESCE(MAX(id), 0) FROM songs').fetchone()[0]
+
+    def play_batches_since(self, after_id, upto_id, target_name=None, batch_size=1000):
+        """
+        Yields lists of plays (dicts, as search_plays) with after_id < id <= upto_id
+        in insertion order, reading one keyset batch at a time.
+        """
+        target_clause = "AND p.target_name = ?" if target_name else ""
+        while True:
+            cursor = self._connect().execute(f'''
+                SELECT {self.PLAY_SELECT}
+                FROM songs s
+                JOIN playlists p ON p.url = s.playlist_url
+                WHERE s.id > ? AND s.id <= ? {target_clause}
+                ORDER BY s.id
+                LIMIT ?
+            ''', (after_id, upto_id, *([target_name] if target_name else []), batch_size))
+            rows = cursor.fetchall()
+            if rows:
+                yield [dict(zip(self.PLAY_COLUMNS, row)) for row in rows]
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1][0]
+
+    def recent_play_times(self, target_name, limit=200):
+        """play_datetime of the target's newest playlists with a known time, oldest first."""
+        cursor = self._connect().execute('''
+            SELECT play_datetime FROM playlists
+            WHERE target_name = ? AND length(play_datetime) > 10
+            ORDER BY play_datetime DESC
+            LIMIT ?
+        ''', (target_name, limit))
+        return [datetime.fromisoformat(row[0]) for row in reversed(cursor.fetchall())]
+
+    def top_artists(self, target_name, start_month=None, end_month=None, limit=20):
+        """[(artist, plays)] from the monthly rollup; months are 'YYYY-MM', end exclusive."""
+        cursor = self._connect().execute('''
+            SELECT MAX(artist), SUM(plays) AS total FROM rollup_artist_month
+            WHERE target_name = ? AND month >= ? AND month < ?
+            GROUP BY artist_key
+            ORDER BY total DESC
+            LIMIT ?
+        ''', (target_name, start_month or '', end_month or '9999', limit))
+        return cursor.fetchall()
+
+    def top_tracks(self, target_name, start_month=None, end_month=None, limit=20):
+        """[(artist, song, plays)] from the monthly track rollup; months are 'YYYY-MM', end exclusive."""
+        cursor = self._connect().execute('''
+            SELECT MAX(artist), MAX(song), SUM(plays) AS total FROM rollup_track_month
+            WHERE target_name = ? AND month >= ? AND month < ?
+            GROUP BY track_key
+            ORDER BY total DESC
+            LIMIT ?
+        ''', (target_name, start_month or '', end_month or '9999', limit))
+        return cursor.fetchall()
+
+    def plays_by_month_hour(self, target_name, start_month=None, end_month=None):
+        """[(month, hour, plays)] from the monthly rollup; hour -1 is an unknown play time."""
+        cursor = self._connect().execute('''
+            SELECT month, hour, plays FROM rollup_hour_month
+            WHERE target_name = ? AND month >= ? AND month < ?
+            ORDER BY month, hour
+        ''', (target_name, start_month or '', end_month or '9999'))
+        return cursor.fetchall()
+
+    def get_export_buckets(self, target_name, bucket_expr):
+        cursor = self._connect().execute(
+            f'SELECT {bucket_expr} AS bucket FROM playlists p WHERE p.target_name = ? GROUP BY bucket', (target_name,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+    def iter_export_rows(self, target_name, bucket_expr, bucket, start_date=None, end_date=None):
+        """
+        Streams one bucket's CSV rows (artist, song, album, date_str, time_str) from
+        the cursor, keeping only the most recent play of each track (canonical track_key).
+        Dedupe and ordering run in SQL, so memory use does not grow with history.
+        """
+        where = "p.target_name = ?"
         params = [target_name]
-        
-        # Note: Filtering by date string is tricky without strict parsing, 
-        # but for now we fetch all and filter in python or rely on the order
-        # Basic implementation: Sort by creation timestamp
-        query += " ORDER BY s.timestamp DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        return rows
+        if start_date:
+            where += " AND p.play_datetime >= ?"
+            params.append(start_date)
+        if end_date:
+            where += " AND p.play_datetime < ?"
+            params.append(end_date)
+        where += f" AND {bucket_expr} = ?"
+        params.append(bucket)
+
+        cursor = self._connect().execute(f'''
+            SELECT artist, song, album, date_str, time_str FROM (
+                SELECT s.artist, s.song, s.album, p.date_str, p.time_str, s.timestamp, s.id,
+                       ROW_NUMBER() OVER (
+                           PARTITION BY s.track_key
+                           ORDER BY s.timestamp DESC, s.id DESC
+                       ) AS play_rank
+                FROM playlists p
+                JOIN songs s ON s.playlist_url = p.url
+                WHERE {where}
+            )
+            WHERE play_rank = 1
+            ORDER BY timestamp DESC, id DESC
+        ''', params)
+        yield from cursor
+
+    def get_playlist_buckets(self, urls, bucket_expr):
+        """Distinct export buckets the given playlists fall into."""
+        urls = list(urls)
+        if not urls:
+            return set()
+        placeholders = ",".join("?" * len(urls))
+        cursor = self._connect().execute(
+            f'SELECT DISTINCT {bucket_expr} FROM playlists p WHERE p.url IN ({placeholders})', urls
+        )
+        return {row[0] for row in cursor.fetchall()}
+
+    def get_export_record(self, path):
+        """Returns (row_count, sha256) recorded for an exported CSV, or None."""
+        cursor = self._connect().execute('SELECT row_count, sha256 FROM export_files WHERE path = ?', (path,))
+        return cursor.fetchone()
+
+    def get_export_records(self, folder):
+        """Returns {path: (target_name, bucket, row_count, sha256)} for CSVs exported into folder."""
+        cursor = self._connect().execute('SELECT path, target_name, bucket, row_count, sha256 FROM export_files')
+        return {row[0]: row[1:] for row in cursor.fetchall() if os.path.dirname(row[0]) == folder}
+
+    def save_export_record(self, path, target_name, bucket, row_count, sha256):
+        try:
+            with self._transaction() as cursor:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO export_files (path, target_name, bucket, row_count, sha256, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (path, target_name, bucket, row_count, sha256, datetime.now()))
+        except Exception as e:
+            logging.error(f"Error saving export record: {e}")
+
+    def get_validators(self, url):
+        """Returns (etag, last_modified) stored for url, or (None, None)."""
+        cursor = self._connect().execute('SELECT etag, last_modified FROM http_validators WHERE url = ?', (url,))
+        row = cursor.fetchone()
+        return row if row else (None, None)
+
+    def save_validators(self, url, etag, last_modified):
+        try:
+            with self._transaction() as cursor:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO http_validators (url, etag, last_modified, updated_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (url, etag, last_modified, datetime.now()))
+        except Exception as e:
+            logging.error(f"Error saving validators: {e}")
+
+    def get_search_result(self, track_key, negative_ttl_hours=168):
+        """
+        Returns (hit, video_id). A hit with video_id None is a cached "no match";
+        those expire after negative_ttl_hours so the track gets searched again.
+        """
+        conn = self._connect()
+        row = conn.execute('SELECT video_id, created_at FROM search_cache WHERE track_key = ?', (track_key,)).fetchone()
+        if row is None:
+            return False, None
+
+        video_id, created_at = row
+        if video_id is None:
+            cutoff = datetime.now() - timedelta(hours=negative_ttl_hours)
+            if datetime.fromisoformat(created_at) < cutoff:
+                return False, None
+
+        # Read-only here: last_used and the hit counter are written by flush_search_hits
+        with self._search_hits_lock:
+            self._search_hits[track_key] = datetime.now()
+            self._search_hit_count += 1
+        return True, video_id
+
+    def flush_search_hits(self):
+        """
+        Writes the buffered hits' last_used times and the hit counter in one
+        transaction. Best-effort: on failure the hits are kept for the next flush.
+        """
+        with self._search_hits_lock:
+            hits, self._search_hits = self._search_hits, {}
+            count, self._search_hit_count = self._search_hit_count, 0
+        if not hits:
+            return
+        try:
+            with self._transaction() as cursor:
+                cursor.executemany('UPDATE search_cache SET last_used = ? WHERE track_key = ?',
+                                   [(used, key) for key, used in hits.items()])
+                self._increment_counter(cursor, 'search_cache_hits', count)
+        except Exception as e:
+            logging.error(f"Error saving search cache hits: {e}")
+            with self._search_hits_lock:
+                for key, used in hits.items():
+                    self._search_hits.setdefault(key, used)
+                self._search_hit_count += count
+
+    def save_search_result(self, track_key, video_id):
+        """Caches a search result; every save follows a cache miss, so misses are counted here."""
+        try:
+            now = datetime.now()
+            with self._transaction() as cursor:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO search_cache (track_key, video_id, created_at, last_used)
+                    VALUES (?, ?, ?, ?)
+                ''', (track_key, video_id, now, now))
+                self._increment_counter(cursor, 'search_cache_misses')
+        except Exception as e:
+            logging.error(f"Error saving search result: {e}")
+
+    def _increment_counter(self, cursor, name, amount=1):
+        cursor.execute('''
+            INSERT INTO counters (name, value) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET value = value + excluded.value
+        ''', (name, amount))
+
+    def get_counters(self):
+        return dict(self._connect().execute('SELECT name, value FROM counters').fetchall())
+
+    def prune_search_cache(self, max_entries):
+        """Evicts the least recently used entries beyond max_entries."""
+        with self._transaction() as cursor:
+            cursor.execute('''
+                DELETE FROM search_cache WHERE track_key IN (
+                    SELECT track_key FROM search_cache
+                    ORDER BY last_used DESC
+                    LIMIT -1 OFFSET ?
+                )
+            ''', (max_entries,))
+            return cursor.rowcount
+
+    def get_synced_tracks(self, playlist_id):
+        """Returns {track_key: video_id} for everything already pushed to playlist_id."""
+        cursor = self._connect().execute('SELECT track_key, video_id FROM synced_tracks WHERE playlist_id = ?', (playlist_id,))
+        return dict(cursor.fetchall())
+
+    def record_synced_tracks(self, playlist_id, tracks):
+        """tracks: iterable of (track_key, video_id) now present in the playlist."""
+        try:
+            now = datetime.now()
+            with self._transaction() as cursor:
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO synced_tracks (playlist_id, track_key, video_id, synced_at)
+                    VALUES (?, ?, ?, ?)
+                ''', [(playlist_id, key, video_id, now) for key, video_id in tracks])
+        except Exception as e:
+            logging.error(f"Error recording synced tracks: {e}")
+
+    def get_yt_playlist(self, title):
+        row = self._connect().execute('SELECT playlist_id FROM yt_playlists WHERE title = ?', (title,)).fetchone()
+        return row[0] if row else None
+
+    def save_yt_playlists(self, playlists, filename=None):
+        """playlists: iterable of (title, playlist_id). Keeps any filename already recorded."""
+        now = datetime.now()
+        with self._transaction() as cursor:
+            cursor.executemany('''
+                INSERT INTO yt_playlists (title, playlist_id, filename, updated_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT(title) DO UPDATE SET
+                    playlist_id = excluded.playlist_id,
+                    filename = COALESCE(excluded.filename, yt_playlists.filename),
+                    updated_at = excluded.updated_at
+            ''', [(title, playlist_id, filename, now) for title, playlist_id in playlists])
+
+    def search_cache_size(self):
+        return self._connect().execute('SELECT COUNT(*) FROM search_cache').fetchone()[0]
+
+    def data_version(self):
+        """Changes whenever another connection (thread or process) commits; see PRAGMA data_version."""
+        return self._connect().execute('PRAGMA data_version').fetchone()[0]
+
+    JOB_COLUMNS = ('id', 'kind', 'lane', 'params', 'status', 'progress', 'message', 'checkpoint',
+                   'cancel_requested', 'created_at', 'started_at', 'finished_at')
+
+    # The dashboard's job list: checkpoints (file lists, pushed track keys) can be large and it never shows them
+    JOB_LIST_COLUMNS = tuple(column for column in JOB_COLUMNS if column != 'checkpoint')
+
+    def _job_row(self, row, columns=JOB_COLUMNS):
+        if row is None:
+            return None
+        job = dict(zip(columns, row))
+        job['params'] = json.loads(job['params'] or '{}')
+        if 'checkpoint' in job:
+            job['checkpoint'] = json.loads(job['checkpoint'] or '{}')
+        return job
+
+    def create_job(self, kind, lane, params):
+        with self._transaction() as cursor:
+            cursor.execute('''
+                INSERT INTO jobs (kind, lane, params, status, message, created_at)
+                VALUES (?, ?, ?, 'queued', 'Queued', ?)
+            ''', (kind, lane, json.dumps(params), datetime.now()))
+            return cursor.lastrowid
+
+    def claim_job(self):
+        """
+        Marks the oldest queued job whose lane is idle as running and returns it.
+        Jobs in one lane run one at a time; different lanes run side by side.
+        """
+        with self._transaction() as cursor:
+            row = cursor.execute(f'''
+                SELECT {', '.join(self.JOB_COLUMNS)} FROM jobs
+                WHERE status = 'queued'
+                  AND lane NOT IN (SELECT lane FROM jobs WHERE status = 'running')
+                ORDER BY id LIMIT 1
+            ''').fetchone()
+            if row is None:
+                return None
+            now = datetime.now()
+            cursor.execute("UPDATE jobs SET status = 'running', message = 'Starting...', started_at = ? WHERE id = ?", (now, row[0]))
+        job = self._job_row(row)
+        job['status'] = 'running'
+        job['message'] = 'Starting...'
+        job['started_at'] = now
+        return job
+
+    def update_job(self, job_id, **fields):
+        """Sets any of status, progress, message, checkpoint (dict) and finished_at."""
+        if 'checkpoint' in fields:
+            fields['checkpoint'] = json.dumps(fields['checkpoint'])
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        with self._transaction() as cursor:
+            cursor.execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def request_job_cancel(self, job_id):
+        """
+        Cancels a queued job outright and flags a running one. Returns the job's
+        status afterwards, or None if it is unknown or already finished.
+        """
+        with self._transaction() as cursor:
+            row = cursor.execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if row is None or row[0] not in ('queued', 'running'):
+                return None
+            if row[0] == 'queued':
+                cursor.execute(
+                    "UPDATE jobs SET status = 'cancelled', message = 'Cancelled', finished_at = ? WHERE id = ?",
+                    (datetime.now(), job_id)
+                )
+                return 'cancelled'
+            cursor.execute('UPDATE jobs SET cancel_requested = 1 WHERE id = ?', (job_id,))
+            return 'running'
+
+    def requeue_interrupted_jobs(self):
+        """Puts jobs left running by a previous process back in the queue; they resume from their checkpoint."""
+        with self._transaction() as cursor:
+            cursor.execute('''
+                UPDATE jobs SET status = CASE WHEN cancel_requested THEN 'cancelled' ELSE 'queued' END
+                WHERE status = 'running'
+            ''')
+            return cursor.rowcount
+
+    def get_job(self, job_id):
+        row = self._connect().execute(
+            f"SELECT {', '.join(self.JOB_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return self._job_row(row)
+
+    def list_jobs(self, limit=20):
+        """Unfinished jobs first (oldest first), then the most recently finished. Checkpoints are left out."""
+        cursor = self._connect().execute(f'''
+            SELECT {', '.join(self.JOB_LIST_COLUMNS)} FROM jobs
+            ORDER BY status IN ('queued', 'running') DESC,
+                     CASE WHEN status IN ('queued', 'running') THEN id ELSE -id END
+            LIMIT ?
+        ''', (limit,))
+        return [self._job_row(row, self.JOB_LIST_COLUMNS) for row in cursor.fetchall()]
 
 class Scraper:
     def __init__(self, config_path="config.yaml"):
@@ -133,18 +1027,165 @@ class Scraper:
         
         self.db = Database(self.config['database_path'])
         self.headers = {'User-Agent': self.config.get('user_agent', 'WUOG-Scraper/1.0')}
+        self.fetch_concurrency = max(1, self.config.get('fetch_concurrency', 4))
+
+        # One pooled keep-alive session per Scraper, retrying transient failures
+        http_cfg = self.config.get('http', {})
+        retry = Retry(
+            total=http_cfg.get('retries', 3),
+            backoff_factor=http_cfg.get('backoff_factor', 1),
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"],
+            respect_retry_after_header=True
+        )
+        # Room for a backfill and a scheduled cycle crawling at the same time
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=2 * (self.fetch_concurrency + 1), max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.timeout = http_cfg.get('timeout_seconds', 30)
+
+        # Politeness is enforced per host rather than with fixed sleeps
+        self._host_limiters = {}
+        self._host_limiters_lock = threading.Lock()
+
+    def _host_limiter(self, url):
+        host = urlparse(url).netloc
+        with self._host_limiters_lock:
+            if host not in self._host_limiters:
+                politeness = self.config.get('politeness', {})
+                self._host_limiters[host] = TokenBucket(politeness.get('requests_per_second', 1), politeness.get('burst', 2))
+            return self._host_limiters[host]
+
+    def _get(self, url, conditional=False, kind="playlist"):
+        """
+        GET through the pooled session. With conditional=True the stored ETag /
+        Last-Modified are sent, so an unchanged page comes back as a bodiless 304.
+        kind ("list" / "playlist") labels the fetch metrics.
+        """
+        headers = {}
+        if conditional:
+            etag, last_modified = self.db.get_validators(url)
+            if etag:
+                headers['If-None-Match'] = etag
+            if last_modified:
+                headers['If-Modified-Since'] = last_modified
+
+        self._host_limiter(url).acquire()
+        with metrics.SPINITRON_FETCH_SECONDS.time(kind=kind):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        metrics.SPINITRON_RESPONSES.inc(kind=kind, status=response.status_code)
+        metrics.SPINITRON_FETCH_BYTES.inc(len(response.content), kind=kind)
+        return response
+
+    def _remember_validators(self, url, response):
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self.db.save_validators(url, etag, last_modified)
 
     def run_cycle(self):
         logging.info("Starting scrape cycle...")
         for target in self.config['targets']:
-            self.process_target(target)
+            self.poll_target(target)
+        self.db.optimize()
         logging.info("Cycle complete.")
 
-    def process_target(self, target, max_pages=1):
-        logging.info(f"Processing target: {target['name']} (Pages: {max_pages})")
-        new_playlists_found = False
+    def poll_target(self, target):
+        """One scheduled crawl of target. Returns the number of new playlists saved."""
+        # Pages until already-crawled playlists are reached, so downtime is caught up.
+        # A target without a watermark has never been crawled; backfill is explicit.
+        max_pages = self.config.get('max_catchup_pages', 10) if self.db.get_watermark(target['name']) else 1
+        return self.process_target(target, max_pages=max_pages)
+
+    def process_target(self, target, max_pages=1, gap_repair=False, start_page=1, on_page=None, should_stop=None):
+        """
+        Crawls up to max_pages list pages for target. Normally paging stops at the
+        first page that reaches the stored watermark or holds only known playlists;
+        gap_repair=True walks every page to fill holes in older history.
+
+        on_page(page_num, completed) is called before each list page and once at
+        the end; completed is the last page whose playlists are all saved, so a
+        resumed run can pass start_page=completed + 1.
+
+        should_stop() is polled while crawling; once it returns True paging stops,
+        detail fetches that have not started are dropped and only the ones already
+        running are saved.
+
+        Returns the number of new playlists saved.
+        """
+        logging.info(f"Processing target: {target['name']} (Pages: {max_pages}{', gap repair' if gap_repair else ''})")
+        watermark = self.db.get_watermark(target['name'])
+        newest_url = None
+        dirty_urls = set()
+        saved = 0
+
+        # Detail pages are fetched and parsed on a worker pool while this thread
+        # keeps paging and writes finished playlists to the DB as they arrive.
+        pool = ThreadPoolExecutor(max_workers=self.fetch_concurrency)
+        in_flight = {}
+        queued_urls = set()
+        # Paging waits for detail fetches beyond this, so a stop never has a backlog to drain
+        max_in_flight = 2 * self.fetch_concurrency
+
+        # List-page validators are only stored once every new playlist on that page
+        # was saved, so a failed detail fetch is retried instead of hidden behind a 304.
+        page_responses = {}
+        failed_pages = set()
+        page_order = []
+        completed = start_page - 1
+
+        def completed_page():
+            # Highest page with nothing left in flight and no failures below it
+            nonlocal completed
+            pending = {page_url for _, page_url in in_flight.values()}
+            while page_order and page_order[0][1] not in pending and page_order[0][1] not in failed_pages:
+                completed = page_order.pop(0)[0]
+            return completed
+
+        def stop_requested():
+            return bool(should_stop and should_stop())
+
+        def drop_pending():
+            # Fetches that have not started are cancelled; their pages stay incomplete
+            for future, (_, page_url) in list(in_flight.items()):
+                if future.cancel():
+                    del in_flight[future]
+                    failed_pages.add(page_url)
+
+        def save_finished(block):
+            nonlocal saved
+            # A blocking wait still wakes every second so should_stop is noticed
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED, timeout=1 if block else 0)
+            for future in done:
+                playlist_data, page_url = in_flight.pop(future)
+                try:
+                    songs = future.result()
+                except Exception as e:
+                    # Leave the playlist unsaved so the next cycle picks it up again
+                    logging.error(f"Failed to scrape songs from {playlist_data['url']}: {e}")
+                    metrics.record_error('scrape_playlist', e)
+                    failed_pages.add(page_url)
+                    continue
+                new_songs = self.db.save_playlist_with_songs(playlist_data, songs)
+                if new_songs is None:
+                    # Not saved: keep the page's validators and the watermark back so it is retried
+                    failed_pages.add(page_url)
+                    continue
+                saved += 1
+                if new_songs:
+                    dirty_urls.add(playlist_data['url'])
+                logging.info(f"Scraped {len(songs)} songs from {playlist_data['url']}")
         
-        for page_num in range(1, max_pages + 1):
+        stopped = False
+        for page_num in range(start_page, max_pages + 1):
+            if stop_requested():
+                logging.info(f"Stopping {target['name']} before page {page_num} as requested.")
+                stopped = True
+                break
+            if on_page:
+                on_page(page_num, completed_page())
             if max_pages > 1:
                 logging.info(f"Scraping page {page_num}...")
                 
@@ -152,228 +1193,322 @@ class Scraper:
             if page_num > 1:
                 separator = "&" if "?" in target['url'] else "?"
                 page_url = f"{target['url']}{separator}page={page_num}"
+            page_order.append((page_num, page_url))
 
             try:
-                response = requests.get(page_url, headers=self.headers)
+                response = self._get(page_url, conditional=True, kind="list")
+                if response.status_code == 304:
+                    logging.info(f"Page {page_num} unchanged since last fetch.")
+                    if not gap_repair:
+                        break
+                    continue
                 response.raise_for_status()
-                soup = BeautifulSoup(response.content, 'html.parser')
+                page_responses[page_url] = response
 
                 # Find playlist items
                 # Spinitron structure: div.list-item
-                playlist_items = soup.find_all('div', {'class': 'list-item'})
+                with metrics.PARSE_SECONDS.time(page="list"):
+                    page_playlists = extract_playlists(response.content, target['url'])
                 
-                if not playlist_items:
+                if not page_playlists:
                     logging.info("No playlists found on this page. Stopping.")
                     break
 
-                for item in playlist_items:
-                    link_tag = item.find('a', {'class': 'link row'})
-                    if not link_tag:
-                        continue
-                    
-                    playlist_url = urljoin(target['url'], link_tag['href'])
-                    
-                    # Check if we already have this playlist
-                    # Improvement: If backfilling, we might encounter existing ones. 
-                    # If we find one that exists, should we stop? 
-                    # For now, let's skip but continue the page loop in case of gaps.
-                    if self.db.playlist_exists(playlist_url):
+                if page_num == 1:
+                    newest_url = page_playlists[0]['url']
+
+                # One query for the whole page instead of one connection per item
+                page_urls = [entry['url'] for entry in page_playlists]
+                known = self.db.existing_playlists(page_urls)
+
+                for entry in page_playlists:
+                    playlist_url = entry['url']
+                    if playlist_url in queued_urls or playlist_url in known:
                         continue # Skip if processed
+                    queued_urls.add(playlist_url)
                     
-                    new_playlists_found = True
-                    
-                    # Parse metadata
-                    dt_div = item.find('div', {'class': 'datetime playlist'})
-                    date_str = ""
-                    time_str = ""
-                    if dt_div:
-                        # Robust extraction
-                        try:
-                            month = dt_div.find('span', {'class': 'month'}).text.strip()
-                            day = dt_div.find('span', {'class': 'day'}).text.strip()
-                            year = dt_div.find('span', {'class': 'year'}).text.strip()
-                            date_str = f"{month} {day} {year}"
-                            time_str = dt_div.find('span', {'class': 'time'}).text.strip()
-                        except AttributeError:
-                            logging.warning(f"Could not parse date/time for {playlist_url}")
-
-                    show_title = item.find('h3', {'class': 'show-title'}).text.strip() if item.find('h3', {'class': 'show-title'}) else "N/A"
-                    dj_name = item.find('p', {'class': 'dj-name'}).text.strip() if item.find('p', {'class': 'dj-name'}) else "N/A"
-
-                    playlist_data = {
-                        'url': playlist_url,
-                        'target_name': target['name'],
-                        'show_title': show_title,
-                        'dj_name': dj_name,
-                        'date_str': date_str,
-                        'time_str': time_str
-                    }
+                    playlist_data = dict(entry, target_name=target['name'])
                     
-                    # Scrape the songs for this playlist
-                    songs = self.scrape_songs(playlist_url)
-                    
-                    # Save
-                    self.db.save_playlist(playlist_data)
-                    self.db.save_songs(playlist_url, songs)
-                    logging.info(f"Scraped {len(songs)} songs from {playlist_url}")
+                    # Scrape the songs for this playlist in the background
+                    in_flight[pool.submit(self.scrape_songs, playlist_url, True)] = (playlist_data, page_url)
+                    while len(in_flight) >= max_in_flight and not stop_requested():
+                        save_finished(block=True)
+
+                # Save whatever has finished while we move on to the next page
+                save_finished(block=False)
 
-                    time.sleep(1) # Be polite
+                if not gap_repair and (watermark in page_urls or known.issuperset(page_urls)):
+                    logging.info(f"Reached previously crawled playlists on page {page_num}. Stopping.")
+                    break
 
             except Exception as e:
+                failed_pages.add(page_url)
                 logging.error(f"Error processing target {target['name']} page {page_num}: {e}")
+                metrics.record_error('scrape_list', e)
+
+        try:
+            while in_flight:
+                if stopped or stop_requested():
+                    stopped = True
+                    drop_pending()
+                save_finished(block=True)
+            for page_url, response in page_responses.items():
+                if page_url not in failed_pages:
+                    self._remember_validators(page_url, response)
+            # Only advance the watermark after a clean crawl, so nothing is left behind it
+            if newest_url and not failed_pages and self.db.existing_playlists([newest_url]):
+                self.db.set_watermark(target['name'], newest_url)
+        except Exception as e:
+            logging.error(f"Error saving playlists for {target['name']}: {e}")
+        finally:
+            pool.shutdown()
+        if on_page:
+            on_page(None, completed_page())
                 
         # After processing all pages for this target
-        if new_playlists_found or max_pages > 1: # Always export if we did a backfill run
+        if gap_repair and not stopped: # Full re-export after a backfill run; unchanged files are skipped
             self.export_data(target)
+        elif dirty_urls and target.get('consolidation', 'none') != 'none':
+            self.export_data(target, buckets=self.db.get_playlist_buckets(dirty_urls, self.bucket_sql(target)))
+        return saved
 
-    def scrape_songs(self, playlist_url):
+    def scrape_songs(self, playlist_url, raise_errors=False):
         songs = []
         try:
-            response = requests.get(playlist_url, headers=self.headers)
+            response = self._get(playlist_url)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
             
             # Song rows: tr.spin-item
-            song_rows = soup.find_all('tr', {'class': 'spin-item'})
-            for row in song_rows:
-                artist = row.find('span', {'class': 'artist'}).text.strip() if row.find('span', {'class': 'artist'}) else "Unknown"
-                song_title = row.find('span', {'class': 'song'}).text.strip() if row.find('span', {'class': 'song'}) else "Unknown"
-                album = row.find('span', {'class': 'release'}).text.strip() if row.find('span', {'class': 'release'}) else "N/A"
-                
-                songs.append({
-                    'artist': artist,
-                    'song': song_title,
-                    'album': album
-                })
+            with metrics.PARSE_SECONDS.time(page="playlist"):
+                songs = extract_spins(response.content)
         except Exception as e:
+            if raise_errors:
+                raise
             logging.error(f"Failed to scrape songs from {playlist_url}: {e}")
+            metrics.record_error('scrape_playlist', e)
         return songs
 
-    def export_data(self, target):
+    def bucket_sql(self, target):
+        """
+        SQL expression (over playlists p) naming a play's export bucket, e.g.
+        "Light_Side_Spring_2026" or "January_2026", computed from play_datetime.
+        """
+        export_mode = target.get('consolidation', 'none')
+        time_filter = target.get('time_filter') # e.g. {'start': 7, 'end': 22}
+
+        # Determine Time Grouping (Monthly vs Seasonal)
+        if export_mode == 'seasonal':
+            # Spring: Jan - July, Fall: Aug - Dec
+            time_group = ("CASE WHEN CAST(strftime('%m', p.play_datetime) AS INTEGER) <= 7 THEN 'Spring_' ELSE 'Fall_' END"
+                          " || strftime('%Y', p.play_datetime)")
+        else:
+            # Default to monthly
+            months = " ".join(f"WHEN '{i:02d}' THEN '{calendar.month_name[i]}_'" for i in range(1, 13))
+            time_group = f"CASE strftime('%m', p.play_datetime) {months} END || strftime('%Y', p.play_datetime)"
+        time_group = f"CASE WHEN p.play_datetime IS NULL THEN 'Unknown_Date' ELSE {time_group} END"
+
+        if not time_filter:
+            return f"({time_group})"
+
+        # Date-only values mean the time failed to parse; those count as Dark_Side
+        variant = (f"CASE WHEN length(p.play_datetime) > 10 AND CAST(strftime('%H', p.play_datetime) AS INTEGER) "
+                   f"BETWEEN {int(time_filter['start'])} AND {int(time_filter['end']) - 1} "
+                   f"THEN 'Light_Side_' ELSE 'Dark_Side_' END")
+        return f"({variant} || {time_group})"
+
+    def bucket_range(self, target, bucket):
+        """(start, end) ISO dates covering a bucket, or (None, None) if it can't be bounded."""
+        group = re.sub(r'^(Light_Side|Dark_Side)_', '', bucket) if target.get('time_filter') else bucket
+        match = re.fullmatch(r'(Spring|Fall)_(\d{4})', group)
+        if match:
+            year = int(match.group(2))
+            if match.group(1) == 'Spring':
+                return f"{year}-01-01", f"{year}-08-01"
+            return f"{year}-08-01", f"{year + 1}-01-01"
+        try:
+            start = datetime.strptime(group, "%B_%Y")
+        except ValueError:
+            return None, None
+        end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+        return start.date().isoformat(), end.date().isoformat()
+
+    def export_data(self, target, buckets=None):
+        """
+        Writes one CSV per bucket. With buckets given, only those files are
+        regenerated; files whose content checksum is unchanged are left alone.
+        """
         export_mode = target.get('consolidation', 'none')
         if export_mode == 'none':
             return
+        if buckets is not None and not buckets:
+            return
             
         folder = target['export_folder']
         os.makedirs(folder, exist_ok=True)
-        
-        # Fetch all songs
-        rows = self.db.get_songs_for_consolidation(target['name'])
-        
-        # Fetch filter settings
-        time_filter = target.get('time_filter') # e.g. {'start': 7, 'end': 22}
 
-        # Bucket by Month_Year AND Variant (Light/Dark Side)
-        buckets = {}
-        
-        for row in rows:
-            # row = (artist, song, album, date_str, time_str)
-            date_str = row[3]
-            time_str = row[4] # e.g. "2:30 PM"
-            
-            variant = "Standard" # Default if no filter
-            
-            # Apply Time Filter if configured
-            if time_filter:
-                try:
-                    # Parse time string "2:30 PM" -> 14.5 or just hour 14
-                    t = datetime.strptime(time_str, "%I:%M %p")
-                    hour = t.hour
-                    
-                    if time_filter['start'] <= hour < time_filter['end']:
-                        variant = "Light_Side"
-                    else:
-                        variant = "Dark_Side"
-                except ValueError:
-                     # If parsing fails, fall back to "Dark_Side" or handle
-                     variant = "Dark_Side"
-
-            # Determine Time Grouping (Monthly vs Seasonal)
-            try:
-                # Remove ordinal suffixes
-                clean_date = re.sub(r'(\d+)(st|nd|rd|th)', r'\1', date_str)
-                dt = datetime.strptime(clean_date, "%b %d %Y")
-                
-                if export_mode == 'seasonal':
-                    year = dt.year
-                    # Spring: Jan - July, Fall: Aug - Dec
-                    if 1 <= dt.month <= 7:
-                        season = "Spring"
-                    else:
-                        season = "Fall"
-                    time_group = f"{season}_{year}"
-                else:
-                    # Default to monthly
-                    time_group = dt.strftime("%B_%Y")
-
-            except ValueError:
-                logging.warning(f"Failed to parse date: {date_str}. Using 'Unknown_Date'")
-                time_group = "Unknown_Date"
-            
-            # Construct Bucket Key
-            # e.g. "Light_Side_Spring_2026" or "Automation_January_2026"
-            if time_filter:
-                bucket_key = f"{variant}_{time_group}"
+        # Bucket by Month_Year AND Variant (Light/Dark Side) in SQL
+        bucket_expr = self.bucket_sql(target)
+        if buckets is None:
+            buckets = self.db.get_export_buckets(target['name'], bucket_expr)
+
+        # Write separate CSVs, streaming each bucket from the DB into its writer.
+        # Dedupe keeps only the most recent play of each track (canonical track_key) per bucket.
+        for key in buckets:
+            start_date, end_date = self.bucket_range(target, key)
+            with metrics.EXPORT_BUCKET_SECONDS.time(target=target['name']):
+                rows = self.db.iter_export_rows(target['name'], bucket_expr, key, start_date, end_date)
+                self._write_bucket(target, folder, key, rows)
+
+        self.write_manifest(folder)
+
+    def write_manifest(self, folder):
+        """
+        Writes folder/manifest.json describing every CSV in it (target, rows, size,
+        mtime, sha256) so the dashboard never has to scan or hash the files.
+        CSVs exported before export records existed are hashed once here.
+        """
+        records = self.db.get_export_records(folder)
+        prefixes = [(f"{t['name'].replace(' ', '_')}_", t['name']) for t in self.config['targets'] if t['export_folder'] == folder]
+        files = {}
+        for filename in sorted(os.listdir(folder)):
+            if not filename.endswith('.csv'):
+                continue
+            path = os.path.join(folder, filename)
+            stat = os.stat(path)
+            record = records.get(path)
+            if record:
+                target_name, bucket, row_count, checksum = record
             else:
-                bucket_key = time_group
-            
-            if bucket_key not in buckets:
-                buckets[bucket_key] = []
-            buckets[bucket_key].append(row)
-            
-        # Write separate CSVs
-        for bucket_key, bucket_rows in buckets.items():
-            filename = f"{target['name'].replace(' ', '_')}_{bucket_key}.csv"
-            filepath = os.path.join(folder, filename)
-            
-            # Deduplicate: Keep only one instance of (Artist, Song) pair per month
-            # Since rows are ordered by timestamp DESC, this keeps the most recent play.
-            seen_songs = set()
-            unique_rows = []
-            
-            for row in bucket_rows:
-                # row = (artist, song, album, date_str, time_str)
-                artist = row[0].strip().lower()
-                song = row[1].strip().lower()
-                
-                # Create a unique key
-                key = (artist, song)
-                
-                if key not in seen_songs:
-                    seen_songs.add(key)
-                    unique_rows.append(row)
-            
-            try:
-                with open(filepath, 'w', newline='', encoding='utf-8') as f:
-                    writer = csv.writer(f)
-                    writer.writerow(['Artist', 'Song', 'Album', 'Date_Played', 'Time_Played'])
-                    writer.writerows(unique_rows)
-                logging.info(f"Exported {len(bucket_rows)} songs to {filename}")
-            except Exception as e:
-                logging.error(f"Error exporting CSV {filename}: {e}")
+                sha = hashlib.sha256()
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 16), b''):
+                        sha.update(chunk)
+                with open(path, encoding='utf-8') as f:
+                    row_count = max(sum(1 for _ in csv.reader(f)) - 1, 0)
+                checksum, bucket = sha.hexdigest(), None
+                target_name = next((name for prefix, name in prefixes if filename.startswith(prefix)), None)
+                # Recorded so the next manifest does not hash this file again
+                self.db.save_export_record(path, target_name, bucket, row_count, checksum)
+            files[filename] = {
+                "target": target_name,
+                "bucket": bucket,
+                "rows": row_count,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": checksum,
+            }
+
+        manifest = {"generated_at": datetime.now().isoformat(timespec='seconds'), "files": files}
+        with tempfile.NamedTemporaryFile('w', dir=folder, prefix=f".{MANIFEST_NAME}.", suffix=".tmp",
+                                         encoding='utf-8', delete=False) as f:
+            json.dump(manifest, f, indent=2)
+        _publish(f.name, os.path.join(folder, MANIFEST_NAME))
+        return manifest
+
+    def export_snapshot(self, folder, max_age_seconds=3600):
+        """
+        Every play as gzipped NDJSON, oldest first, in folder/plays-<cursor>.ndjson.gz
+        where cursor is the newest songs.id included. The latest snapshot is reused
+        while nothing new was inserted or it is younger than max_age_seconds; older
+        snapshots are removed. Returns (path, cursor).
+        """
+        existing = sorted((int(m.group(1)), name) for name in os.listdir(folder)
+                          if (m := SNAPSHOT_PATTERN.match(name)))
+        cursor = self.db.max_song_id()
+        if existing:
+            latest, name = existing[-1]
+            path = os.path.join(folder, name)
+            if latest == cursor or time.time() - os.stat(path).st_mtime < max_age_seconds:
+                return path, latest
+
+        with tempfile.NamedTemporaryFile(dir=folder, prefix=".plays-", suffix=".tmp", delete=False) as raw:
+            with gzip.open(raw, 'wt', encoding='utf-8', compresslevel=6) as f:
+                for batch in self.db.play_batches_since(0, cursor, batch_size=5000):
+                    f.write(''.join(json.dumps(play) + '\n' for play in batch))
+        path = os.path.join(folder, f"plays-{cursor}.ndjson.gz")
+        _publish(raw.name, path)
+        for _, name in existing:
+            os.remove(os.path.join(folder, name))
+        logging.info(f"Wrote play snapshot {path}")
+        return path, cursor
+
+    def _write_bucket(self, target, folder, key, rows):
+        """
+        Writes rows to a temp file in the export folder and renames it over the
+        CSV, so readers never see a half-written file. Skips the rename when the
+        checksum matches what was last exported.
+        """
+        filename = f"{target['name'].replace(' ', '_')}_{key}.csv"
+        filepath = os.path.join(folder, filename)
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=folder, prefix=f".{filename}.", suffix=".tmp",
+                                             newline='', encoding='utf-8', delete=False) as f:
+                tmp_path = f.name
+                out = _HashingWriter(f)
+                writer = csv.writer(out)
+                writer.writerow(['Artist', 'Song', 'Album', 'Date_Played', 'Time_Played'])
+                row_count = 0
+                for row in rows:
+                    writer.writerow(row)
+                    row_count += 1
+            checksum = out.hexdigest()
+
+            previous = self.db.get_export_record(filepath)
+            if previous and previous[1] == checksum and os.path.exists(filepath):
+                os.remove(tmp_path)
+                logging.info(f"{filename} unchanged ({row_count} songs)")
+                return
+
+            _publish(tmp_path, filepath)
+            self.db.save_export_record(filepath, target['name'], key, row_count, checksum)
+            logging.info(f"Exported {row_count} songs to {filename}")
+        except Exception as e:
+            logging.error(f"Error exporting CSV {filename}: {e}")
+            metrics.record_error('export', e)
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+def run_pending_jobs():
+    """
+    schedule.run_pending(), recording how late each due job starts. A long
+    cycle holding the loop shows up here as lag on whatever runs next.
+    """
+    for job in sorted(job for job in schedule.jobs if job.should_run):
+        func = getattr(job.job_func, 'func', job.job_func)
+        metrics.SCHEDULER_LAG_SECONDS.observe(
+            max((datetime.now() - job.next_run).total_seconds(), 0),
+            job=getattr(func, '__name__', str(func)),
+        )
+        job.run()
 
 def main():
     parser = argparse.ArgumentParser(description="WUOG Scraper")
     parser.add_argument("--once", action="store_true", help="Run once and exit")
+    parser.add_argument("--gap-repair", type=int, metavar="PAGES", help="Walk PAGES list pages per target, filling any gaps, then exit")
     args = parser.parse_args()
 
     logging.info("Initializing WUOG Scraper...")
     scraper = Scraper()
-    
-    # Run once immediately
-    scraper.run_cycle()
+
+    if args.gap_repair:
+        for target in scraper.config['targets']:
+            scraper.process_target(target, max_pages=args.gap_repair, gap_repair=True)
+        logging.info("Gap repair complete. Exiting.")
+        return
     
     if args.once:
+        scraper.run_cycle()
         logging.info("Run once complete. Exiting.")
         return
     
-    # Schedule
-    interval = scraper.config.get('polling_interval_minutes', 60)
-    schedule.every(interval).minutes.do(scraper.run_cycle)
+    # Schedule; the first tick polls every target immediately
+    polling = schedule_polling(scraper)
+    schedule.run_all()
     
-    logging.info(f"Scheduler started. Polling every {interval} minutes.")
+    logging.info(f"Scheduler started. {polling}.")
     while True:
-        schedule.run_pending()
+        run_pending_jobs()
         time.sleep(1)
 
 if __name__ == "__main__":
@@ -0,0 +1,94 @@
+import re
+import threading
+import time
+import logging
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available.
+    The refill rate adapts: penalize() halves it (down to min_rate) after a
+    throttling response, reward() slowly restores it towards the configured rate.
+    """
+    def __init__(self, rate, burst=1, min_rate=None):
+        self.max_rate = float(rate)
+        self.rate = float(rate)
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 8
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def penalize(self):
+        with self.lock:
+            self._refill()
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0
+
+    def reward(self):
+        with self.lock:
+            if self.rate < self.max_rate:
+                self._refill()
+                self.rate = min(self.max_rate, self.rate * 1.1)
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failures; while open, wait() blocks
+    callers until `cooldown` seconds have passed, then lets traffic through again.
+    """
+    def __init__(self, threshold=5, cooldown=60):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.open_until = 0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        while True:
+            with self.lock:
+                remaining = self.open_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.open_until <= time.monotonic():
+                self.open_until = time.monotonic() + self.cooldown
+                logging.warning(f"Circuit breaker open for {self.cooldown}s after {self.failures} failures")
+
+
+def http_status_of(exc):
+    """Best-effort HTTP status extraction from requests/ytmusicapi exceptions."""
+    response = getattr(exc, 'response', None)
+    if response is not None and getattr(response, 'status_code', None):
+        return response.status_code
+    # ytmusicapi raises plain Exceptions: "Server returned HTTP 429: Too Many Requests."
+    match = re.search(r'HTTP (\d{3})', str(exc))
+    return int(match.group(1)) if match else None
+
+
+def is_retryable(exc):
+    status = http_status_of(exc)
+    return status is not None and (status == 429 or 500 <= status < 600)
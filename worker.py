@@ -0,0 +1,122 @@
+"""
+Background worker: the scrape scheduler, the weekly YouTube sync and the job
+queue. Only one worker runs per data directory; the leader holds an exclusive
+lock on worker.lock next to the database, and any other worker waits on it as
+a standby. The web app only queues jobs and reads state, so it can run under a
+multi-worker WSGI server.
+
+Scrape, sync and scheduler metrics are recorded where that work runs, so a
+standalone worker serves its own /metrics on worker.metrics_port.
+
+    python worker.py
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import schedule
+
+import app
+import metrics
+from poller import schedule_polling
+from scraper import run_pending_jobs
+
+LOCK_NAME = "worker.lock"
+
+
+def acquire_leader_lock(db_path, blocking=False):
+    """
+    Returns the open lock file once this process is the leader, or None if
+    another process holds the lock. Keep the file open: closing it (or exiting)
+    releases the lock.
+    """
+    lock_file = open(os.path.join(os.path.dirname(db_path) or ".", LOCK_NAME), "a")
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    return lock_file
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port):
+    """Serves this process's metrics at http://<host>:port/metrics from a daemon thread."""
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logging.info(f"Serving worker metrics on port {port}")
+
+
+def run(lock_file):
+    """Starts the job workers and runs the scheduler forever. Call with the leader lock held."""
+    scraper = app.get_scraper()
+    app.get_job_queue().start()
+    polling = schedule_polling(scraper)
+
+    # Weekly Sync: Sunday at 3 AM
+    schedule.every().sunday.at("03:00").do(app.run_weekly_sync)
+
+    logging.info(f"Scheduler started. {polling}. Weekly sync on Sundays at 03:00.")
+    while True:
+        run_pending_jobs()
+        time.sleep(1)
+
+
+def start_embedded():
+    """
+    Runs the worker in a background thread of the current process. If another
+    worker is already the leader, the thread waits as a standby and takes over
+    when that worker exits. Used by `python app.py`. Returns whether this
+    process became the leader straight away.
+    """
+    db_path = app.get_scraper().config['database_path']
+    lock_file = acquire_leader_lock(db_path)
+    if lock_file is None:
+        logging.info("Another worker holds the leader lock; serving the dashboard and waiting to take over.")
+        threading.Thread(target=_standby, args=(db_path,), name="worker", daemon=True).start()
+        return False
+    threading.Thread(target=run, args=(lock_file,), name="worker", daemon=True).start()
+    return True
+
+
+def _standby(db_path):
+    lock_file = acquire_leader_lock(db_path, blocking=True)
+    logging.info("Acquired leader lock; running the worker in this process.")
+    run(lock_file)
+
+
+def main():
+    config = app.get_scraper().config
+    db_path = config['database_path']
+    lock_file = acquire_leader_lock(db_path)
+    if lock_file is None:
+        logging.info("Another worker is running; waiting to take over as leader...")
+        lock_file = acquire_leader_lock(db_path, blocking=True)
+    logging.info("Acquired leader lock.")
+    # Only the leader binds the port, so a standby on the same host does not collide
+    metrics_port = config.get('worker', {}).get('metrics_port', 1786)
+    if metrics_port:
+        serve_metrics(metrics_port)
+    run(lock_file)
+
+
+if __name__ == "__main__":
+    main()